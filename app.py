@@ -1,199 +1,456 @@
+import time
 
 import streamlit as st
+import numpy as np
 import pandas as pd
-import altair as alt
-from streamlit_folium import st_folium
 
 from config import (
     PAGE_TITLE, PAGE_LAYOUT,
-    PATH_UNI_BONN, PATH_EO_AFRICA, PATH_DETECT, PATH_TRA,
-    HEADER_LOGO_WIDTH, FOOTER_LOGO_WIDTH,
-    MAP_HEIGHT_PX
+    MAP_HEIGHT_PX, POPUP_CHART, CHART_POINT_BUDGET, DOWNSAMPLE_METHOD, CHART_WIDTH_PX, COMPARE_POINT_BUDGET,
+    TRACE_ENABLED, TRACE_HISTORY, BACKGROUND_POLL_S, BACKGROUND_RETRY_S,
 )
-from utils import safe_b64
-from parsing import discover_stations, get_series_for
-from webdav_client import list_remote_txts, remote_snapshot_hash
-from ui_map import build_map
+import tracing
+from assets import asset_bundle
+from downsample import downsample_df
+from parsing import (
+    discover_headers, fetch_flight, fill_coverage, get_pyramid_for, load_in_background, station_chart, station_store,
+)
+from pyramid import range_query, ns_to_date, day_bounds_ns
+from station_store import widen_values
+from webdav_client import listing_flight, remote_listing, transport_stats
+# folium/streamlit_folium (map tab), altair (data tab) and matplotlib (PNG
+# charts) are imported where they are first used, so a rerun only pays for
+# the view that is open.
 
 # ---------- PAGE CONFIG ----------
 st.set_page_config(page_title=PAGE_TITLE, layout=PAGE_LAYOUT)
+tracing.begin_run("rerun")
 
-# ---------- STYLES ----------
-st.markdown("""
-<style>
-  .block-container { padding-top: .8rem; padding-bottom: 0; }
-  .header-container{ display:flex; align-items:center; gap:.6rem; margin-top:6px; }
-  .header-container img{ display:block; }
-  .header-container h1{ margin:0; line-height:1.15; }
-  .h-chip{ display:inline-block; background:#e8f4ff; border:1px solid #cfe4ff;
-      padding:4px 10px; border-radius:8px; font-weight:600; font-size:1.05rem;
-      margin:.25rem 0 .5rem 0; }
-  .meta-paragraph{ color:#333; font-size:0.95rem; line-height:1.55; margin-bottom:.6rem; font-weight:600; }
-  .footer{ display:flex; justify-content:space-between; align-items:center; gap:1rem; padding:.25rem 0; }
-  .footer-left{ font-size:.95rem; color:#444; line-height:1.3; font-weight:400; display:flex; align-items:center; gap:.35rem; }
-  .footer-left .at{ opacity:.7; font-weight:700; }
-  .footer-right{ display:flex; align-items:center; gap:1rem; flex-wrap:wrap; justify-content:flex-end; }
-  .footer-right .caption{ font-size:.85rem; color:#666; white-space:nowrap; }
-  .footer-logos{ display:flex; align-items:center; gap:1.2rem; }
-  .footer-logos img{ width:60px; height:auto; }
-  @media (max-width: 900px){ .footer{ flex-direction:column; align-items:flex-start; gap:.5rem; }
-    .footer-right{ justify-content:flex-start; } }
-</style>
-""", unsafe_allow_html=True)
-
-# ---------- HEADER ----------
-uni_bonn_b64  = safe_b64(st, PATH_UNI_BONN,  HEADER_LOGO_WIDTH)
-eo_africa_b64 = safe_b64(st, PATH_EO_AFRICA, FOOTER_LOGO_WIDTH)
-detect_b64    = safe_b64(st, PATH_DETECT,    FOOTER_LOGO_WIDTH)
-tra_b64       = safe_b64(st, PATH_TRA,       FOOTER_LOGO_WIDTH)
-
-st.markdown(
-    f"""
-    <div class="header-container">
-        {'<img src="data:image/png;base64,' + uni_bonn_b64 + f'" width="{HEADER_LOGO_WIDTH}"/>' if uni_bonn_b64 else ''}
-        <h1>RPR Dashboard</h1>
-    </div>
-    """,
-    unsafe_allow_html=True
-)
+# ---------- STYLES + HEADER ----------
+assets = asset_bundle()
+st.markdown(assets["css"], unsafe_allow_html=True)
+for msg in assets["warnings"]:
+    st.warning(msg)
+st.markdown(assets["header"], unsafe_allow_html=True)
 
 # ---------- DATA LOAD (Remote WebDAV) ----------
-_remote_items = list_remote_txts()
-_snapshot = remote_snapshot_hash(_remote_items)
-stations = discover_stations(_snapshot)
+with tracing.span("remote_listing"):
+    _remote_items, _snapshot = remote_listing()
+# Phase one reads only file headers, so the map is up before any series is
+# downloaded; phase two loads series in the background and fills in coverage.
+with tracing.span("discover_headers", cached=True):
+    _headers = discover_headers(_snapshot)
+stations, _progress = fill_coverage(_headers)
+for sid, err in _progress["failed"].items():
+    st.warning(f"Skipped {sid}: {err}")
+
+@st.fragment(run_every=BACKGROUND_POLL_S)
+def _retry_failed_loads():
+    """Retry failed loads once their delay has passed; rerun the page as soon as any is loading again."""
+    load_in_background(_headers)
+    if fill_coverage(_headers)[0]:
+        st.rerun()
 
 if not stations:
-    st.warning("No station .txt files found in the remote folder.")
+    if not _progress["failed"]:
+        st.warning("No station .txt files found in the remote folder.")
+        st.stop()
+    # The page stops here, before the load_in_background call at its end.
+    st.warning(f"All {len(_headers)} station loads failed; retrying every {BACKGROUND_RETRY_S} s.")
+    _retry_failed_loads()
     st.stop()
 
+@st.fragment(run_every=BACKGROUND_POLL_S)
+def _background_progress(loaded_at_render: int):
+    """Rerun the page whenever more stations finish loading; gone once all are in."""
+    state, progress = fill_coverage(stations)
+    loaded = sum(s["n"] is not None for s in state.values())
+    if loaded != loaded_at_render or progress["failed"]:
+        st.rerun()
+    st.caption(f"Loading station series in the background: {loaded} of {len(state)} ready.")
+
+_loaded = sum(s["n"] is not None for s in stations.values())
+if _progress["pending"]:
+    _background_progress(_loaded)
+
 # ---------- TABS ----------
-tab_map, tab_data = st.tabs(["🗺️ Map", "📈 Data"])
-
-with tab_map:
-    st_folium(build_map(stations), width="100%", height=MAP_HEIGHT_PX)
-
-with tab_data:
-    left, right = st.columns([1, 4], gap="large")
-    with left:
-        st.markdown("<div class='h-chip'>Select Site</div>", unsafe_allow_html=True)
-        site = st.selectbox(
-            "Station ID",
-            options=sorted(stations.keys()),
-            index=0,
-            label_visibility="collapsed",
-        )
+# on_change="rerun" tracks the selected tab, so only the open one is computed.
+if TRACE_ENABLED:
+    tab_map, tab_data, tab_compare, tab_diag = st.tabs(
+        ["🗺️ Map", "📈 Data", "🔀 Compare", "🩺 Diagnostics"], key="view", on_change="rerun")
+else:
+    tab_map, tab_data, tab_compare = st.tabs(["🗺️ Map", "📈 Data", "🔀 Compare"], key="view", on_change="rerun")
 
-        s = stations[site]
-        meta, df_all = get_series_for(s["path"], cache_key=s["cache_key"])
+if tab_map.open:
+    from streamlit_folium import st_folium
+    from ui_map import cached_map, station_at, status_legend_html
 
-        if df_all.empty:
-            st.warning("No data available for this station.")
-        else:
-            min_d = df_all["DateTime"].min().date()
-            max_d = df_all["DateTime"].max().date()
+    with tab_map:
+        # Only marker clicks trigger a rerun; panning and zooming stay in the browser.
+        with tracing.span("cached_map", cached=True):
+            fmap = cached_map(_snapshot, stations, None, _loaded, int(time.time() // 3600))
+        with tracing.span("st_folium"):
+            map_state = st_folium(
+                fmap, width="100%", height=MAP_HEIGHT_PX,
+                returned_objects=["last_object_clicked"],
+            )
+        st.markdown(status_legend_html(), unsafe_allow_html=True)
+        clicked = station_at(stations, (map_state or {}).get("last_object_clicked"))
+        if clicked and POPUP_CHART != "none":
+            s = stations[clicked]
+            with tracing.span("station_chart", cached=True, station=clicked):
+                chart = station_chart(s["path"], s["cache_key"], POPUP_CHART)
+            if chart:
+                st.markdown(f"<div class='h-chip'>Station: {clicked}</div>", unsafe_allow_html=True)
+                if POPUP_CHART == "png":
+                    chart = f'<img src="data:image/png;base64,{chart}" style="width:100%; max-width:680px;"/>'
+                st.markdown(f"<div style='max-width:680px'>{chart}</div>", unsafe_allow_html=True)
 
-            st.markdown("<div class='h-chip'>Select Date Range</div>", unsafe_allow_html=True)
-            from_d = st.date_input("From", value=min_d, min_value=min_d, max_value=max_d, key=f"from_{site}")
-            to_d   = st.date_input("To",   value=max_d, min_value=min_d, max_value=max_d, key=f"to_{site}")
+if tab_data.open:
+    import altair as alt
 
-            if from_d > to_d:
-                st.info("‘From’ was after ‘To’. Swapped automatically.")
-                from_d, to_d = to_d, from_d
+    with tab_data:
+        left, right = st.columns([1, 4], gap="large")
+        with left:
+            st.markdown("<div class='h-chip'>Select Site</div>", unsafe_allow_html=True)
+            site = st.selectbox(
+                "Station ID",
+                options=sorted(stations.keys()),
+                index=0,
+                label_visibility="collapsed",
+            )
 
-    with right:
-        if not df_all.empty:
             s = stations[site]
-            st.markdown(f"<div class='h-chip'>Station: {site}</div>", unsafe_allow_html=True)
-
-            lat, lon = s["lat"], s["lon"]
-            coords = f"{lat:.4f}, {lon:.4f}" if (lat is not None and lon is not None) else "coordinates unavailable"
-            water_body = s["meta"].get("water_body") or "Rhine"
-            sensor = s["meta"].get("sensor_type") or s["meta"].get("sensor") or "the station's sensor"
-            start = df_all["DateTime"].min().date()
-            end   = df_all["DateTime"].max().date()
-
-            paragraph = (
-                f"This station is located at {water_body} ({coords}) and is operated by University of Bonn. "
-                f"It uses {sensor} and its data spans from {start} to {end}."
-            )
-            st.markdown(f"<div class='meta-paragraph'>{paragraph}</div>", unsafe_allow_html=True)
-
-            vertical_datum = s["meta"].get("vertical_datum") or s["meta"].get("datum")
-            if vertical_datum:
-                st.markdown(
-                    f"<div style='color:#d62728; font-weight:700; margin-top:.25rem;'>"
-                    f"Vertical datum: {vertical_datum}"
-                    f"</div>",
-                    unsafe_allow_html=True
-                )
+            with tracing.span("get_pyramid_for", cached=True, station=site):
+                pyr = get_pyramid_for(s["path"], cache_key=s["cache_key"])
+            has_data = pyr["raw"]["t"].size > 0
 
-            st.markdown("<div style='height:10px'></div>", unsafe_allow_html=True)
+            if not has_data:
+                st.warning("No data available for this station.")
+            else:
+                min_d = ns_to_date(pyr["raw"]["t"][0])
+                max_d = ns_to_date(pyr["raw"]["t"][-1])
 
-            mask = (df_all["DateTime"].dt.date >= from_d) & (df_all["DateTime"].dt.date <= to_d)
-            df_range = df_all.loc[mask].copy()
+                st.markdown("<div class='h-chip'>Select Date Range</div>", unsafe_allow_html=True)
+                from_d = st.date_input("From", value=min_d, min_value=min_d, max_value=max_d, key=f"from_{site}")
+                to_d   = st.date_input("To",   value=max_d, min_value=min_d, max_value=max_d, key=f"to_{site}")
 
-            if df_range.empty:
-                st.warning("No data in the selected date range.")
-            else:
-                axis = alt.Axis(
-                    title="Date",
-                    format="%b %d",
-                    labelExpr=(
-                        "(month(datum.value) == 0 && date(datum.value) <= 7) "
-                        "? timeFormat(datum.value, '%b %Y') "
-                        ": timeFormat(datum.value, '%b %d')"
-                    ),
-                    labelOverlap=True,
-                    grid=True,
+                if from_d > to_d:
+                    st.info("‘From’ was after ‘To’. Swapped automatically.")
+                    from_d, to_d = to_d, from_d
+
+                with st.expander("⬇️ Export raw data"):
+                    from export import FORMATS, export_file, export_name
+
+                    exp_sites = st.multiselect("Stations", options=sorted(stations.keys()), default=[site],
+                                               key="export_sites")
+                    exp_fmt = st.radio("Format", list(FORMATS), horizontal=True, key="export_fmt")
+                    exp_t0, exp_t1 = day_bounds_ns(from_d, to_d)
+                    st.caption(f"Full-resolution rows from {from_d} to {to_d}, with each station's header metadata.")
+
+                    def _export(sids=tuple(exp_sites), fmt=exp_fmt, t0=exp_t0, t1=exp_t1):
+                        # Runs on click, off the script thread. The export is written chunk by chunk to
+                        # a temp file; only the finished file is read back for Streamlit to serve.
+                        records = [station_store.get(stations[sid]["path"], stations[sid]["cache_key"])
+                                   for sid in sids]
+                        with export_file(records, t0, t1, fmt) as f:
+                            return f.read()
+
+                    st.download_button(
+                        "Download", data=_export, disabled=not exp_sites,
+                        file_name=export_name(exp_sites or [site], from_d, to_d, exp_fmt),
+                        mime=FORMATS[exp_fmt][1], on_click="ignore", key="export_download",
+                    )
+
+        with right:
+            if has_data:
+                s = stations[site]
+                st.markdown(f"<div class='h-chip'>Station: {site}</div>", unsafe_allow_html=True)
+
+                lat, lon = s["lat"], s["lon"]
+                coords = f"{lat:.4f}, {lon:.4f}" if (lat is not None and lon is not None) else "coordinates unavailable"
+                water_body = s["meta"].get("water_body") or "Rhine"
+                sensor = s["meta"].get("sensor_type") or s["meta"].get("sensor") or "the station's sensor"
+                start, end = min_d, max_d
+
+                paragraph = (
+                    f"This station is located at {water_body} ({coords}) and is operated by University of Bonn. "
+                    f"It uses {sensor} and its data spans from {start} to {end}."
                 )
+                st.markdown(f"<div class='meta-paragraph'>{paragraph}</div>", unsafe_allow_html=True)
 
-                ymin = float(df_range["Value"].min())
-                ymax = float(df_range["Value"].max())
-                if ymin == ymax:
-                    pad = abs(ymin) * 0.01 if ymin != 0 else 0.01
-                    ymin, ymax = ymin - pad, ymax + pad
+                vertical_datum = s["meta"].get("vertical_datum") or s["meta"].get("datum")
+                if vertical_datum:
+                    st.markdown(
+                        f"<div style='color:#d62728; font-weight:700; margin-top:.25rem;'>"
+                        f"Vertical datum: {vertical_datum}"
+                        f"</div>",
+                        unsafe_allow_html=True
+                    )
+
+                st.markdown("<div style='height:10px'></div>", unsafe_allow_html=True)
+
+                t0, t1 = day_bounds_ns(from_d, to_d)
+                level, sel = range_query(pyr, t0, t1, CHART_POINT_BUDGET)
+                if level == "raw":
+                    df_range = pd.DataFrame({"DateTime": sel["t"].view("datetime64[ns]"), "Value": sel["v"]})
                 else:
-                    pad = max(2, (ymax - ymin) * 0.02)
-                    ymin, ymax = ymin - pad, ymax + pad
-
-                base_chart = (
-                    alt.Chart(df_range)
-                    .mark_point(size=25, color="#1f77b4")
-                    .encode(
-                        x=alt.X("DateTime:T", axis=axis, scale=alt.Scale(nice="month")),
-                        y=alt.Y(
-                            "Value:Q",
-                            title="Water level (meters)",
-                            scale=alt.Scale(domain=[ymin, ymax], nice=False, zero=False),
-                            axis=alt.Axis(tickCount=6, format="~g", grid=True),
+                    df_range = pd.DataFrame({
+                        "DateTime": sel["t"].view("datetime64[ns]"), "Value": sel["mean"],
+                        "Min": sel["min"], "Max": sel["max"], "Count": sel["count"],
+                    })
+
+                if df_range.empty:
+                    st.warning("No data in the selected date range.")
+                else:
+                    axis = alt.Axis(
+                        title="Date",
+                        format="%b %d",
+                        labelExpr=(
+                            "(month(datum.value) == 0 && date(datum.value) <= 7) "
+                            "? timeFormat(datum.value, '%b %Y') "
+                            ": timeFormat(datum.value, '%b %d')"
                         ),
-                        tooltip=[
-                            alt.Tooltip("DateTime:T", title="Date"),
-                            alt.Tooltip("Value:Q", title="Water level (m)"),
-                        ],
+                        labelOverlap=True,
+                        grid=True,
                     )
-                    .properties(height=360)
-                )
-                chart = base_chart.interactive()
-                st.altair_chart(chart, use_container_width=True)
+
+                    ymin = float(df_range["Min" if level != "raw" else "Value"].min())
+                    ymax = float(df_range["Max" if level != "raw" else "Value"].max())
+                    if ymin == ymax:
+                        pad = abs(ymin) * 0.01 if ymin != 0 else 0.01
+                        ymin, ymax = ymin - pad, ymax + pad
+                    else:
+                        pad = max(2, (ymax - ymin) * 0.02)
+                        ymin, ymax = ymin - pad, ymax + pad
+
+                    df_plot = downsample_df(df_range, CHART_POINT_BUDGET)
+                    # The store keeps float32; chart the values as the file has them.
+                    for col in ("Value", "Min", "Max"):
+                        if col in df_plot:
+                            df_plot[col] = widen_values(df_plot[col].to_numpy())
+                    if level != "raw":
+                        st.caption(
+                            f"Showing {level} means with their min–max band ({len(df_plot):,} points); "
+                            f"narrow the date range for full resolution."
+                        )
+                    elif len(df_plot) < len(df_range):
+                        st.caption(
+                            f"Showing {len(df_plot):,} of {len(df_range):,} points "
+                            f"({DOWNSAMPLE_METHOD.upper()} downsampled); narrow the date range for full resolution."
+                        )
+
+                    x_enc = alt.X("DateTime:T", axis=axis, scale=alt.Scale(nice="month"))
+                    y_scale = alt.Scale(domain=[ymin, ymax], nice=False, zero=False)
+                    tooltip = [
+                        alt.Tooltip("DateTime:T", title="Date"),
+                        alt.Tooltip("Value:Q", title="Water level (m)" if level == "raw" else "Mean level (m)"),
+                    ]
+                    if level != "raw":
+                        tooltip += [
+                            alt.Tooltip("Min:Q", title="Min (m)"),
+                            alt.Tooltip("Max:Q", title="Max (m)"),
+                            alt.Tooltip("Count:Q", title="Samples"),
+                        ]
+
+                    base_chart = (
+                        alt.Chart(df_plot)
+                        .mark_point(size=25, color="#1f77b4")
+                        .encode(
+                            x=x_enc,
+                            y=alt.Y(
+                                "Value:Q",
+                                title="Water level (meters)",
+                                scale=y_scale,
+                                axis=alt.Axis(tickCount=6, format="~g", grid=True),
+                            ),
+                            tooltip=tooltip,
+                        )
+                        .properties(height=360)
+                    )
+                    if level != "raw":
+                        band = (
+                            alt.Chart(df_plot)
+                            .mark_area(opacity=0.2, color="#1f77b4")
+                            .encode(x=x_enc, y=alt.Y("Min:Q", scale=y_scale), y2="Max:Q")
+                        )
+                        base_chart = band + base_chart
+                    with tracing.span("altair", level=level, points=len(df_plot)):
+                        chart = base_chart.interactive()
+                        st.altair_chart(chart, width="stretch")
+
+if tab_compare.open:
+    import altair as alt
+    from compare import align_stations, best_lags, difference, lag_correlation, long_frame
+
+    with tab_compare:
+        left, right = st.columns([1, 4], gap="large")
+        with left:
+            st.markdown("<div class='h-chip'>Select Sites</div>", unsafe_allow_html=True)
+            ids = sorted(stations.keys())
+            picked = st.multiselect("Stations", options=ids, default=ids[:2], key="cmp_sites",
+                                    label_visibility="collapsed")
+            picked = [sid for sid in picked if stations[sid]["n"]]
+
+            if picked:
+                min_d = min(stations[sid]["t_min"] for sid in picked).date()
+                max_d = max(stations[sid]["t_max"] for sid in picked).date()
+                st.markdown("<div class='h-chip'>Select Date Range</div>", unsafe_allow_html=True)
+                cmp_from = st.date_input("From", value=min_d, min_value=min_d, max_value=max_d, key="cmp_from")
+                cmp_to   = st.date_input("To",   value=max_d, min_value=min_d, max_value=max_d, key="cmp_to")
+                if cmp_from > cmp_to:
+                    st.info("‘From’ was after ‘To’. Swapped automatically.")
+                    cmp_from, cmp_to = cmp_to, cmp_from
+
+                st.markdown("<div class='h-chip'>Reference</div>", unsafe_allow_html=True)
+                ref_site = st.selectbox("Reference station", options=picked, key="cmp_ref",
+                                        label_visibility="collapsed")
+                show_diff = st.checkbox("Difference to reference", key="cmp_diff")
+                show_lag = st.checkbox("Lag vs reference", key="cmp_lag")
+
+        with right:
+            if not picked:
+                st.info("Select one or more stations with data to compare.")
+            else:
+                points = max(2, min(CHART_WIDTH_PX, COMPARE_POINT_BUDGET // len(picked)))
+                t0, t1 = day_bounds_ns(cmp_from, cmp_to)
+                with tracing.span("compare", stations=len(picked), points=points):
+                    pyramids = {}
+                    for sid in picked:
+                        s = stations[sid]
+                        pyramids[sid] = get_pyramid_for(s["path"], cache_key=s["cache_key"])
+                    cmp = align_stations(pyramids, t0, t1, points)
+                grid, names, values = cmp["grid"], cmp["stations"], cmp["values"]
+                ref = names.index(ref_site)
+
+                df_cmp = long_frame(grid, names, values)
+                if df_cmp.empty:
+                    st.warning("No data in the selected date range.")
+                else:
+                    coarse = sorted({lvl for lvl in cmp["levels"].values() if lvl != "raw"})
+                    st.caption(
+                        f"{len(names)} stations on a common grid of {grid.size:,} points"
+                        + (f" (from {'/'.join(coarse)} means)" if coarse else "")
+                        + "; narrow the date range for more detail."
+                    )
+                    x_enc = alt.X("DateTime:T", title="Date")
+                    color = alt.Color("Station:N", sort=list(names), legend=alt.Legend(orient="bottom"))
+                    lines = (
+                        alt.Chart(df_cmp)
+                        .mark_line(strokeWidth=1.5)
+                        .encode(
+                            x=x_enc,
+                            y=alt.Y("Value:Q", title="Water level (meters)", scale=alt.Scale(zero=False)),
+                            color=color,
+                            tooltip=[alt.Tooltip("DateTime:T", title="Date"), "Station:N",
+                                     alt.Tooltip("Value:Q", title="Water level (m)", format=".3f")],
+                        )
+                        .properties(height=360)
+                    )
+                    with tracing.span("altair", level="compare", points=len(df_cmp)):
+                        st.altair_chart(lines.interactive(bind_y=False), width="stretch")
+
+                    if show_diff and len(names) > 1:
+                        df_diff = long_frame(grid, names, difference(values, ref), "Difference")
+                        df_diff = df_diff[df_diff["Station"] != ref_site]
+                        st.markdown(f"<div class='h-chip'>Difference to {ref_site}</div>", unsafe_allow_html=True)
+                        diff_chart = (
+                            alt.Chart(df_diff)
+                            .mark_line(strokeWidth=1.2)
+                            .encode(x=x_enc, y=alt.Y("Difference:Q", title="Difference (m)"), color=color,
+                                    tooltip=[alt.Tooltip("DateTime:T", title="Date"), "Station:N",
+                                             alt.Tooltip("Difference:Q", title="Difference (m)", format=".3f")])
+                            .properties(height=220)
+                        )
+                        zero = alt.Chart(pd.DataFrame({"y": [0.0]})).mark_rule(color="#888").encode(y="y:Q")
+                        st.altair_chart((zero + diff_chart).interactive(bind_y=False), width="stretch")
+
+                    if show_lag and len(names) > 1:
+                        step_h = (grid[1] - grid[0]) / 3.6e12 if grid.size > 1 else 0.0
+                        lags, corr = lag_correlation(values, ref, max_lag=grid.size // 4)
+                        best, peak = best_lags(lags, corr)
+                        others = [i for i in range(len(names)) if i != ref]
+                        st.markdown(f"<div class='h-chip'>Lag vs {ref_site}</div>", unsafe_allow_html=True)
+                        df_lag = pd.DataFrame({
+                            "Lag (h)": np.tile(lags * step_h, len(others)),
+                            "Station": np.repeat([names[i] for i in others], lags.size),
+                            "Correlation": corr[others].ravel(),
+                        }).dropna()
+                        lag_chart = (
+                            alt.Chart(df_lag)
+                            .mark_line(strokeWidth=1.2)
+                            .encode(x=alt.X("Lag (h):Q"), y=alt.Y("Correlation:Q", scale=alt.Scale(domain=[-1, 1])),
+                                    color=color)
+                            .properties(height=220)
+                        )
+                        st.altair_chart(lag_chart, width="stretch")
+                        st.dataframe(
+                            pd.DataFrame({
+                                "Station": [names[i] for i in others],
+                                "Best lag (h)": np.round(best[others] * step_h, 2),
+                                "Correlation": np.round(peak[others], 3),
+                            }),
+                            hide_index=True, width="stretch",
+                        )
+                        st.caption(f"Positive lag: the station trails {ref_site}. "
+                                   f"Resolution {step_h:.2f} h (the grid step).")
 
 # ---------- FOOTER ----------
 st.write("---")
-st.markdown(
-    f"""
-    <div class="footer">
-      <div class="footer-left">
-        <span class="at">@</span>Developed by Sajjad Hussain
-      </div>
-      <div class="footer-right">
-        <span class="caption">in collaboration with</span>
-        <div class="footer-logos">
-          {'<img alt="EO Africa" src="data:image/png;base64,' + eo_africa_b64 + '"/>' if (eo_africa_b64 := safe_b64(st, PATH_EO_AFRICA, FOOTER_LOGO_WIDTH)) else ''}
-          {'<img alt="DETECT" src="data:image/png;base64,' + detect_b64 + '"/>' if (detect_b64 := safe_b64(st, PATH_DETECT, FOOTER_LOGO_WIDTH)) else ''}
-          {'<img alt="TRA Sustainable Futures" src="data:image/png;base64,' + tra_b64 + '"/>' if (tra_b64 := safe_b64(st, PATH_TRA, FOOTER_LOGO_WIDTH)) else ''}
-        </div>
-      </div>
-    </div>
-    """,
-    unsafe_allow_html=True
-)
+st.markdown(assets["footer"], unsafe_allow_html=True)
+
+# ---------- DIAGNOSTICS (RPR_TRACE=1) ----------
+_run = tracing.end_run()
+if TRACE_ENABLED and _run is not None:
+    runs = st.session_state.setdefault("diag_runs", [])
+    runs.append(_run)
+    del runs[:-TRACE_HISTORY]
+if TRACE_ENABLED and _run is not None and tab_diag.open:
+    with tab_diag:
+        spans = pd.DataFrame([dict(sp, rerun=i) for i, r in enumerate(runs) for sp in r["spans"]])
+        st.markdown(f"<div class='h-chip'>Last {len(runs)} reruns</div>", unsafe_allow_html=True)
+        st.dataframe(
+            pd.DataFrame([{"rerun": i, "id": r["id"], "total ms": round(r["total_ms"], 1), "spans": len(r["spans"])}
+                          for i, r in enumerate(runs)]).iloc[::-1],
+            hide_index=True, width="stretch",
+        )
+        if not spans.empty:
+            st.markdown("<div class='h-chip'>Per stage (all kept reruns)</div>", unsafe_allow_html=True)
+            summary = spans.groupby("span")["ms"].agg(["count", "sum", "mean", "max"]).round(2)
+            if "cache" in spans:
+                hits = spans.dropna(subset=["cache"]).groupby("span")["cache"].agg(lambda c: f"{(c == 'hit').sum()}/{len(c)}")
+                summary["cache hits"] = hits
+            st.dataframe(summary.sort_values("sum", ascending=False), width="stretch")
+            st.markdown("<div class='h-chip'>This rerun</div>", unsafe_allow_html=True)
+            st.dataframe(spans[spans["rerun"] == len(runs) - 1].drop(columns=["rerun", "run"], errors="ignore"),
+                         hide_index=True, width="stretch")
+
+        st.markdown("<div class='h-chip'>Request coalescing (process-wide)</div>", unsafe_allow_html=True)
+        st.dataframe(pd.DataFrame([f.stats() for f in (listing_flight, fetch_flight, station_store.loads)]),
+                     hide_index=True, width="stretch")
+
+        st.markdown("<div class='h-chip'>WebDAV requests (process-wide)</div>", unsafe_allow_html=True)
+        transport = transport_stats.stats()
+        if transport:
+            st.dataframe(pd.DataFrame(transport), hide_index=True, width="stretch")
+            st.caption("Latency is time to response headers over the most recent requests; "
+                       "retries count attempts repeated after a connection error, 429 or 5xx.")
+        else:
+            st.caption("No requests yet.")
+
+        mem = station_store.report()
+        st.markdown(
+            f"<div class='h-chip'>Station store: {mem['total_bytes'] / 2**20:.1f} of "
+            f"{mem['budget_bytes'] / 2**20:.0f} MB</div>",
+            unsafe_allow_html=True,
+        )
+        if mem["stations"]:
+            per_station = pd.DataFrame(mem["stations"])
+            per_station["MB"] = (per_station.pop("bytes") / 2**20).round(2)
+            per_station["last_used"] = pd.to_datetime(per_station["last_used"], unit="s")
+            st.dataframe(per_station, hide_index=True, width="stretch")
+
+# ---------- BACKGROUND LOADING ----------
+# Started at the very end so this run's page is out before parsing competes
+# with the script thread for the GIL.
+load_in_background(stations)
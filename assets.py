@@ -0,0 +1,65 @@
+from config import (
+    PATH_UNI_BONN, PATH_EO_AFRICA, PATH_DETECT, PATH_TRA,
+    HEADER_LOGO_WIDTH, FOOTER_LOGO_WIDTH,
+)
+from st_compat import cache_resource
+from utils import safe_b64
+
+# ---------- STYLES ----------
+CSS = """
+<style>
+  .block-container { padding-top: .8rem; padding-bottom: 0; }
+  .header-container{ display:flex; align-items:center; gap:.6rem; margin-top:6px; }
+  .header-container img{ display:block; }
+  .header-container h1{ margin:0; line-height:1.15; }
+  .h-chip{ display:inline-block; background:#e8f4ff; border:1px solid #cfe4ff;
+      padding:4px 10px; border-radius:8px; font-weight:600; font-size:1.05rem;
+      margin:.25rem 0 .5rem 0; }
+  .meta-paragraph{ color:#333; font-size:0.95rem; line-height:1.55; margin-bottom:.6rem; font-weight:600; }
+  .footer{ display:flex; justify-content:space-between; align-items:center; gap:1rem; padding:.25rem 0; }
+  .footer-left{ font-size:.95rem; color:#444; line-height:1.3; font-weight:400; display:flex; align-items:center; gap:.35rem; }
+  .footer-left .at{ opacity:.7; font-weight:700; }
+  .footer-right{ display:flex; align-items:center; gap:1rem; flex-wrap:wrap; justify-content:flex-end; }
+  .footer-right .caption{ font-size:.85rem; color:#666; white-space:nowrap; }
+  .footer-logos{ display:flex; align-items:center; gap:1.2rem; }
+  .footer-logos img{ width:60px; height:auto; }
+  @media (max-width: 900px){ .footer{ flex-direction:column; align-items:flex-start; gap:.5rem; }
+    .footer-right{ justify-content:flex-start; } }
+</style>
+"""
+
+@cache_resource(show_spinner=False)
+def asset_bundle() -> dict:
+    """Static page markup, built once per process: {"css", "header", "footer", "warnings"}.
+
+    Each logo is resized and base64-encoded here exactly once; reruns only
+    resend the finished strings. "warnings" lists logos that could not be read.
+    """
+    warnings = []
+    uni_bonn_b64  = safe_b64(PATH_UNI_BONN,  HEADER_LOGO_WIDTH, warnings)
+    eo_africa_b64 = safe_b64(PATH_EO_AFRICA, FOOTER_LOGO_WIDTH, warnings)
+    detect_b64    = safe_b64(PATH_DETECT,    FOOTER_LOGO_WIDTH, warnings)
+    tra_b64       = safe_b64(PATH_TRA,       FOOTER_LOGO_WIDTH, warnings)
+
+    header = f"""
+    <div class="header-container">
+        {'<img src="data:image/png;base64,' + uni_bonn_b64 + f'" width="{HEADER_LOGO_WIDTH}"/>' if uni_bonn_b64 else ''}
+        <h1>RPR Dashboard</h1>
+    </div>
+    """
+    footer = f"""
+    <div class="footer">
+      <div class="footer-left">
+        <span class="at">@</span>Developed by Sajjad Hussain
+      </div>
+      <div class="footer-right">
+        <span class="caption">in collaboration with</span>
+        <div class="footer-logos">
+          {'<img alt="EO Africa" src="data:image/png;base64,' + eo_africa_b64 + '"/>' if eo_africa_b64 else ''}
+          {'<img alt="DETECT" src="data:image/png;base64,' + detect_b64 + '"/>' if detect_b64 else ''}
+          {'<img alt="TRA Sustainable Futures" src="data:image/png;base64,' + tra_b64 + '"/>' if tra_b64 else ''}
+        </div>
+      </div>
+    </div>
+    """
+    return {"css": CSS, "header": header, "footer": footer, "warnings": warnings}
@@ -0,0 +1,78 @@
+"""Benchmark: Data tab chart payload and build time, raw vs downsampled.
+
+    python benchmarks/bench_chart.py --rows 10000 100000 1000000
+
+For each series length the Altair point chart used in the Data tab is built
+from the raw frame and from the LTTB / min-max reduced frame; reported are
+the Vega-Lite JSON payload size, the time to build and serialize it, and, if
+vl-convert-python is installed, the time to render it to SVG.
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import altair as alt
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from config import CHART_POINT_BUDGET  # noqa: E402
+from downsample import downsample_df  # noqa: E402
+
+try:
+    import vl_convert as vlc
+except ImportError:
+    vlc = None
+
+alt.data_transformers.disable_max_rows()
+
+
+def synthetic_series(rows: int) -> pd.DataFrame:
+    t = np.datetime64("2015-01-01T00:00:00") + np.arange(rows) * np.timedelta64(300, "s")
+    rng = np.random.default_rng(0)
+    v = 100 + np.sin(np.arange(rows) / 288.0) + rng.normal(0, 0.02, rows)
+    v[rng.integers(0, rows, 5)] += 3  # flood spikes a stride would miss
+    return pd.DataFrame({"DateTime": t, "Value": v})
+
+
+def chart_json(df: pd.DataFrame) -> str:
+    return (
+        alt.Chart(df)
+        .mark_point(size=25, color="#1f77b4")
+        .encode(x="DateTime:T", y=alt.Y("Value:Q", scale=alt.Scale(zero=False)),
+                tooltip=["DateTime:T", "Value:Q"])
+        .properties(height=360)
+        .interactive()
+        .to_json()
+    )
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    ap.add_argument("--budget", type=int, default=CHART_POINT_BUDGET)
+    args = ap.parse_args()
+
+    print(f"{'rows':>9} {'method':>7} {'points':>7} {'max kept':>8} {'reduce s':>9} {'json KB':>9} {'build s':>8} {'render s':>9}")
+    for rows in args.rows:
+        df = synthetic_series(rows)
+        for method in ["raw", "lttb", "minmax"]:
+            t0 = time.perf_counter()
+            d = df if method == "raw" else downsample_df(df, args.budget, method)
+            t_reduce = time.perf_counter() - t0
+            t0 = time.perf_counter()
+            spec = chart_json(d)
+            t_build = time.perf_counter() - t0
+            t_render = float("nan")
+            if vlc is not None:
+                t0 = time.perf_counter()
+                vlc.vegalite_to_svg(spec)
+                t_render = time.perf_counter() - t0
+            peak_kept = d["Value"].max() == df["Value"].max()
+            print(f"{rows:>9} {method:>7} {len(d):>7} {str(peak_kept):>8} {t_reduce:>9.3f} "
+                  f"{len(spec) / 1024:>9.0f} {t_build:>8.3f} {t_render:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
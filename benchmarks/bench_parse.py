@@ -0,0 +1,98 @@
+"""Micro-benchmark: legacy sniffing parser vs parsing.parse_station_bytes and
+the streaming parser (parsing.parse_station_stream, fed 1 MB chunks).
+
+    python benchmarks/bench_parse.py --rows 200000 1000000 --seps , ";" tab
+
+Files are synthetic but follow the station format ("# key: value" header
+lines, a column header, then DateTime/height rows). "peak MB" is the
+tracemalloc peak of one parse on top of the input bytes.
+"""
+import argparse
+import sys
+import time
+import tracemalloc
+from io import StringIO
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from synthetic import SEPS, synthetic_station  # noqa: E402
+from parsing import META_RE, _clean_key, _pick_columns, parse_station_bytes, parse_station_stream  # noqa: E402
+
+
+def legacy_parse(data: bytes, name: str):
+    """The parser as it was before the fast path, kept verbatim for comparison."""
+    lines = data.decode("utf-8", errors="ignore").splitlines()
+    meta = {}
+    data_start = 0
+    for i, line in enumerate(lines):
+        if line.startswith("#"):
+            m = META_RE.match(line)
+            if m:
+                meta[_clean_key(m.group(1))] = m.group(2).strip()
+        else:
+            data_start = i
+            break
+    csv_text = "\n".join(lines[data_start:])
+    df = pd.read_csv(StringIO(csv_text), comment="#", sep=None, engine="python")
+    df.columns = [c.strip() for c in df.columns]
+    dt_col, val_col = _pick_columns(list(df.columns))
+    df = df[[dt_col, val_col]].rename(columns={dt_col: "DateTime", val_col: "Value"})
+    df["DateTime"] = pd.to_datetime(df["DateTime"], errors="coerce")
+    df = df.dropna(subset=["DateTime"]).sort_values("DateTime").reset_index(drop=True)
+    return meta, df
+
+
+def stream_parse(data: bytes, name: str, chunk: int = 1 << 20):
+    chunks = (data[i:i + chunk] for i in range(0, len(data), chunk))
+    return parse_station_stream(chunks, name, size_hint=len(data))
+
+
+def peak_mb(fn) -> float:
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] / 2**20
+    finally:
+        tracemalloc.stop()
+
+
+def best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    ap.add_argument("--seps", nargs="+", default=[",", ";", "tab"], choices=sorted(SEPS))
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    print(f"{'rows':>10} {'sep':>4} {'MB':>7} {'legacy s':>9} {'fast s':>8} {'stream s':>9} {'speedup':>8} "
+          f"{'legacy peak MB':>15} {'stream peak MB':>15}  same")
+    for rows in args.rows:
+        for sep_name in args.seps:
+            data = synthetic_station(rows, SEPS[sep_name])
+            _, df_old = legacy_parse(data, "BENCH.txt")
+            _, df_new, _ = parse_station_bytes(data, "BENCH.txt")
+            same = "legacy parsed nothing" if df_old.empty else (len(df_old) == len(df_new)
+                    and (df_old["DateTime"].to_numpy("datetime64[ns]") == df_new["DateTime"].to_numpy("datetime64[ns]")).all()
+                    and np.allclose(df_old["Value"].to_numpy(float), df_new["Value"].to_numpy(float)))
+            t_old = best_of(lambda: legacy_parse(data, "BENCH.txt"), args.repeat)
+            t_new = best_of(lambda: parse_station_bytes(data, "BENCH.txt"), args.repeat)
+            t_stream = best_of(lambda: stream_parse(data, "BENCH.txt"), args.repeat)
+            m_old = peak_mb(lambda: legacy_parse(data, "BENCH.txt"))
+            m_stream = peak_mb(lambda: stream_parse(data, "BENCH.txt"))
+            print(f"{rows:>10} {sep_name:>4} {len(data) / 1e6:>7.1f} {t_old:>9.3f} {t_new:>8.3f} {t_stream:>9.3f} "
+                  f"{t_old / t_new:>7.1f}x {m_old:>15.1f} {m_stream:>15.1f}  {same}")
+
+
+if __name__ == "__main__":
+    main()
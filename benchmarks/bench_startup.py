@@ -0,0 +1,87 @@
+"""Time-to-first-paint of app.py in a fresh process, fully offline.
+
+    python benchmarks/bench_startup.py --stations 20 --rows 20000 --repeat 3
+
+Each measurement is a new Python process (so module imports are really paid)
+that mounts the WebDAV stand-in and runs app.py once through Streamlit's
+AppTest, then once more as a rerun. The first process starts with an empty
+disk cache; the others find it populated, as after a deploy with prewarm.py
+or a process restart. "first run" is the script run that produces the first
+page; "heavy modules" lists which of matplotlib/folium/altair/PIL it loaded.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from urllib.parse import urljoin
+
+HERE = Path(__file__).resolve().parent
+HEAVY = ("matplotlib", "folium", "altair", "PIL")
+
+
+def child(args):
+    t0 = time.perf_counter()
+    import streamlit.logger
+    from streamlit.testing.v1 import AppTest
+    streamlit.logger.set_log_level("error")
+    t_streamlit = time.perf_counter() - t0
+
+    sys.path.insert(0, str(HERE.parent))
+    sys.path.insert(0, str(HERE))
+    import webdav_client
+    from config import WEBDAV_BASE, WEBDAV_FOLDER
+    from mock_webdav import MockWebDAV
+    from synthetic import synthetic_network
+    files = synthetic_network(args.stations, args.rows, args.seps, 1)
+    MockWebDAV(files, urljoin(WEBDAV_BASE, WEBDAV_FOLDER)).install(webdav_client._session)
+    before = {m for m in HEAVY if m in sys.modules}
+
+    at = AppTest.from_file(str(HERE.parent / "app.py"), default_timeout=300)
+    t0 = time.perf_counter()
+    at.run()
+    t_first = time.perf_counter() - t0
+    errors = [e.value for e in at.exception]
+    heavy = sorted(m for m in HEAVY if m in sys.modules and m not in before)
+
+    t0 = time.perf_counter()
+    at.run()
+    t_rerun = time.perf_counter() - t0
+    print(json.dumps({"streamlit": t_streamlit, "first": t_first, "rerun": t_rerun,
+                      "heavy": heavy, "errors": errors}))
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--stations", type=int, default=20)
+    ap.add_argument("--rows", type=int, default=20_000, help="rows per station")
+    ap.add_argument("--seps", nargs="+", default=[","], choices=[",", ";", "tab", "|"])
+    ap.add_argument("--repeat", type=int, default=3, help="warm-cache processes to time")
+    ap.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    if args.child:
+        return child(args)
+
+    cache_dir = tempfile.mkdtemp(prefix="rpr-startup-")
+    env = dict(os.environ, RPR_CACHE_DIR=cache_dir, PYTHONWARNINGS="ignore")
+    cmd = [sys.executable, __file__, "--child", "--stations", str(args.stations), "--rows", str(args.rows),
+           "--seps", *args.seps]
+    print(f"{args.stations} stations x {args.rows:,} rows, cache={cache_dir}")
+    print(f"{'disk cache':>10} {'import st s':>12} {'first run s':>12} {'rerun s':>8}  heavy modules")
+    for i in range(1 + args.repeat):
+        out = subprocess.run(cmd, env=env, capture_output=True, text=True, cwd=HERE.parent)
+        lines = [l for l in out.stdout.splitlines() if l.startswith("{")]
+        if out.returncode or not lines:
+            sys.exit(out.stderr[-2000:])
+        r = json.loads(lines[-1])
+        if r["errors"]:
+            sys.exit(f"app raised: {r['errors']}")
+        print(f"{'cold' if i == 0 else 'warm':>10} {r['streamlit']:>12.2f} {r['first']:>12.2f} {r['rerun']:>8.2f}  "
+              f"{', '.join(r['heavy']) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
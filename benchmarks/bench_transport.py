@@ -0,0 +1,146 @@
+"""Tail latency of file downloads over a flaky network, bare session vs webdav_client's transport.
+
+    python benchmarks/bench_transport.py --requests 200 --fail-rate 0.05 --stall-rate 0.02 --stall-s 8
+
+A local HTTP server (real sockets, so timeouts and retries really happen)
+serves one station file. Each request independently fails with a 503 at
+--fail-rate, or stalls for --stall-s before answering at --stall-rate; the
+rest answer after --latency-ms. Both clients download it --requests times
+from --workers threads:
+
+  bare       requests.Session as before: default pool, no timeout, no retry
+  transport  webdav_client._session: pooled, timeouts, jittered retries, gzip
+
+Reported: p50/p95/p99/max seconds per download, failed downloads, retries
+and bytes on the wire. A final pass checks that If-None-Match with the
+file's ETag gets a cheap 304.
+"""
+import argparse
+import gzip
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import numpy as np
+import requests
+
+HERE = Path(__file__).resolve().parent
+sys.path.insert(0, str(HERE.parent))
+sys.path.insert(0, str(HERE))
+
+
+class FlakyServer:
+    def __init__(self, body: bytes, fail_rate: float, stall_rate: float, stall_s: float, latency_s: float, seed=0):
+        self.body, self.gz = body, gzip.compress(body, 6)
+        self.etag = '"v1"'
+        self.fail_rate, self.stall_rate, self.stall_s, self.latency_s = fail_rate, stall_rate, stall_s, latency_s
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.wire_bytes = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                with server.lock:
+                    roll = server.rng.random()
+                if roll < server.fail_rate:
+                    return self._send(503, b"")
+                time.sleep(server.stall_s if roll < server.fail_rate + server.stall_rate else server.latency_s)
+                if self.headers.get("If-None-Match") == server.etag:
+                    return self._send(304, b"")
+                if "gzip" in self.headers.get("Accept-Encoding", ""):
+                    return self._send(200, server.gz, {"Content-Encoding": "gzip"})
+                self._send(200, server.body)
+
+            def _send(self, status, body, extra=None):
+                self.send_response(status)
+                self.send_header("ETag", server.etag)
+                self.send_header("Content-Length", str(len(body)))
+                for k, v in (extra or {}).items():
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(body)
+                with server.lock:
+                    server.wire_bytes += len(body)
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/station.txt"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+
+def run(get, n: int, workers: int) -> dict:
+    def one(_):
+        t0 = time.perf_counter()
+        try:
+            ok = get()
+        except requests.RequestException:
+            ok = False
+        return time.perf_counter() - t0, ok
+
+    with ThreadPoolExecutor(workers) as pool:
+        results = list(pool.map(one, range(n)))
+    secs = np.array([s for s, _ in results])
+    return {"p50": np.percentile(secs, 50), "p95": np.percentile(secs, 95), "p99": np.percentile(secs, 99),
+            "max": secs.max(), "failed": sum(not ok for _, ok in results)}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--requests", type=int, default=200)
+    ap.add_argument("--workers", type=int, default=8)
+    ap.add_argument("--rows", type=int, default=20_000, help="rows in the served station file")
+    ap.add_argument("--fail-rate", type=float, default=0.05)
+    ap.add_argument("--stall-rate", type=float, default=0.02)
+    ap.add_argument("--stall-s", type=float, default=8.0)
+    ap.add_argument("--latency-ms", type=float, default=20.0)
+    ap.add_argument("--read-timeout", type=float, default=2.0, help="transport read timeout for this run")
+    args = ap.parse_args()
+
+    import webdav_client
+    from synthetic import synthetic_network
+    body = next(iter(synthetic_network(1, args.rows, [","], 1).values()))
+    server = FlakyServer(body, args.fail_rate, args.stall_rate, args.stall_s, args.latency_ms / 1000)
+    transport = webdav_client._session
+    transport.auth = None
+    transport.timeout = (transport.timeout[0], args.read_timeout)
+
+    bare = requests.Session()
+
+    def get_bare():
+        r = bare.get(server.url)
+        r.raise_for_status()
+        return r.content == body
+
+    def get_transport():
+        r = transport.get(server.url)
+        r.raise_for_status()
+        return r.content == body
+
+    print(f"{args.requests} downloads of {len(body) / 1024:.0f} KB, {args.workers} workers, "
+          f"fail {args.fail_rate:.0%}, stall {args.stall_rate:.0%} x {args.stall_s:g} s")
+    print(f"{'client':>10} {'p50 s':>7} {'p95 s':>7} {'p99 s':>7} {'max s':>7} {'failed':>7} {'retries':>8} {'wire MB':>8}")
+    for name, get in (("bare", get_bare), ("transport", get_transport)):
+        server.wire_bytes = 0
+        webdav_client.transport_stats.reset()
+        r = run(get, args.requests, args.workers)
+        retries = sum(row["retries"] for row in webdav_client.transport_stats.stats()) if name == "transport" else 0
+        print(f"{name:>10} {r['p50']:>7.3f} {r['p95']:>7.3f} {r['p99']:>7.3f} {r['max']:>7.3f} {r['failed']:>7} "
+              f"{retries:>8} {server.wire_bytes / 2**20:>8.2f}")
+
+    server.fail_rate = server.stall_rate = 0
+    r = transport.get(server.url, headers={"If-None-Match": server.etag})
+    print(f"If-None-Match: {r.status_code}, {len(r.content)} bytes")
+
+
+if __name__ == "__main__":
+    main()
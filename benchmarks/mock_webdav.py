@@ -0,0 +1,146 @@
+"""In-process WebDAV stand-in mounted on webdav_client's requests session.
+
+Serves PROPFIND (Depth 0/1/infinity, with folder ETags that change when
+anything beneath them changes) and GET with Range over a dict of
+{relative path: bytes}, so the load path runs with no network at all.
+"""
+import hashlib
+import io
+import threading
+import time
+from urllib.parse import urlparse, unquote
+
+from requests.adapters import BaseAdapter
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+
+
+class _StreamedBody(io.BytesIO):
+    """Response body for stream=True readers; only the bytes read count as sent."""
+    def __init__(self, body: bytes, server):
+        super().__init__(body)
+        self.server = server
+
+    def read(self, n=-1):
+        data = super().read(n)
+        with self.server.lock:
+            self.server.bytes_sent += len(data)
+        return data
+
+
+class MockWebDAV(BaseAdapter):
+    def __init__(self, files: dict, root_url: str, latency_s: float = 0.0):
+        super().__init__()
+        self.files = files
+        self.root = urlparse(root_url).path
+        self.latency_s = latency_s
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.bytes_sent = 0
+
+    def install(self, session):
+        """Route every http(s) request of session here."""
+        session.mount("https://", self)
+        session.mount("http://", self)
+        return self
+
+    def reset_counters(self):
+        with self.lock:
+            self.requests = 0
+            self.bytes_sent = 0
+
+    def _etag(self, prefix: str) -> str:
+        h = hashlib.md5()
+        for k in sorted(self.files):
+            if k.startswith(prefix):
+                h.update(k.encode())
+                h.update(str(len(self.files[k])).encode())
+                h.update(self.files[k][-64:])
+        return h.hexdigest()
+
+    def _entry(self, rel: str, is_dir: bool) -> str:
+        href = self.root + rel
+        if is_dir:
+            props = "<d:resourcetype><d:collection/></d:resourcetype>"
+        else:
+            b = self.files[rel]
+            props = (f"<d:resourcetype/><d:getcontentlength>{len(b)}</d:getcontentlength>"
+                     f"<d:getlastmodified>Mon, 01 Jan 2024 00:00:00 GMT</d:getlastmodified>"
+                     f"<d:displayname>{rel.rsplit('/', 1)[-1]}</d:displayname>")
+        etag = self._etag(rel)
+        return (f"<d:response><d:href>{href}</d:href><d:propstat><d:prop>"
+                f"<d:getetag>\"{etag}\"</d:getetag>{props}</d:prop></d:propstat></d:response>")
+
+    def _propfind(self, folder: str, depth: str) -> bytes:
+        out = ['<?xml version="1.0"?><d:multistatus xmlns:d="DAV:">', self._entry(folder, True)]
+        if depth != "0":
+            subdirs = set()
+            for rel in sorted(self.files):
+                if not rel.startswith(folder):
+                    continue
+                parts = rel[len(folder):].split("/")[:-1]
+                if depth == "infinity":
+                    subdirs.update(folder + "/".join(parts[:i]) + "/" for i in range(1, len(parts) + 1))
+                elif parts:
+                    subdirs.add(folder + parts[0] + "/")
+                if depth == "infinity" or not parts:
+                    out.append(self._entry(rel, False))
+            out.extend(self._entry(d, True) for d in sorted(subdirs))
+        out.append("</d:multistatus>")
+        return "".join(out).encode()
+
+    def send(self, request, **kwargs):
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        resp = Response()
+        resp.request = request
+        resp.url = request.url
+        resp.headers = CaseInsensitiveDict()
+        rel = unquote(urlparse(request.url).path)
+        rel = rel[len(self.root):] if rel.startswith(self.root) else None
+
+        if rel is None:
+            resp.status_code, body = 404, b""
+        elif request.method == "PROPFIND":
+            if rel and not rel.endswith("/") and rel in self.files:
+                resp.status_code, body = 207, self._propfind(rel, "0")
+            else:
+                resp.status_code, body = 207, self._propfind(rel, request.headers.get("Depth", "1"))
+        elif request.method == "GET" and rel in self.files:
+            body = self.files[rel]
+            etag = self._etag(rel)
+            resp.headers["ETag"] = f'"{etag}"'
+            rng = request.headers.get("Range", "")
+            if request.headers.get("If-None-Match", "").strip('"') == etag:
+                resp.status_code, body = 304, b""
+            elif rng.startswith("bytes="):
+                start, _, end = rng[6:].partition("-")
+                start = int(start)
+                end = int(end) if end else len(body) - 1
+                if start >= len(body):
+                    resp.status_code, body = 416, b""
+                else:
+                    resp.status_code, body = 206, body[start:end + 1]
+            else:
+                resp.status_code = 200
+        else:
+            resp.status_code, body = 404, b""
+
+        if kwargs.get("stream"):
+            # Read as the caller consumes it; a body closed unread is not counted.
+            resp._content = False
+            resp.raw = _StreamedBody(body, self)
+        else:
+            resp._content = body
+            resp.raw = io.BytesIO(body)
+        resp.headers["Content-Length"] = str(len(body))
+        resp.encoding = "utf-8"
+        with self.lock:
+            self.requests += 1
+            if not kwargs.get("stream"):
+                self.bytes_sent += len(body)
+        return resp
+
+    def close(self):
+        pass
+
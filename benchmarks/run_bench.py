@@ -0,0 +1,157 @@
+"""End-to-end load-path benchmark, fully offline.
+
+    python benchmarks/run_bench.py --stations 40 --rows 100000 --seps , ";" --latency-ms 30
+
+Synthetic stations are served by an in-process WebDAV stand-in mounted on
+webdav_client's session (see mock_webdav.py), and the dashboard's load path
+runs against it as the app does: listing -> headers (discover_headers) ->
+series (load_in_background until every station has coverage; download +
+parse + disk cache) -> popup charts -> map. Three scenarios are measured:
+
+  cold   empty disk cache, fresh process state (first deploy)
+  warm   disk cache populated, in-memory caches cleared (process restart)
+  rerun  everything cached in memory (a widget interaction)
+
+For each: wall time per stage, peak traced memory, request count and bytes
+served. Download and parse are also timed in isolation for the breakdown.
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from urllib.parse import urljoin
+
+HERE = Path(__file__).resolve().parent
+sys.path.insert(0, str(HERE.parent))
+sys.path.insert(0, str(HERE))
+
+
+@contextmanager
+def _stage(stages: dict, name: str):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        stages[name] = stages.get(name, 0.0) + time.perf_counter() - t0
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--stations", type=int, default=20)
+    ap.add_argument("--rows", type=int, default=50_000, help="rows per station")
+    ap.add_argument("--seps", nargs="+", default=[","], choices=[",", ";", "tab", "|"],
+                    help="delimiters, assigned to stations round-robin")
+    ap.add_argument("--folders", type=int, default=1, help="spread stations over this many subfolders")
+    ap.add_argument("--latency-ms", type=float, default=0.0, help="simulated round-trip time per request")
+    ap.add_argument("--chart", default=None, choices=["svg", "png", "none"], help="popup renderer (default: config)")
+    ap.add_argument("--map-mode", default=None, choices=["markers", "geojson", "cluster"])
+    ap.add_argument("--scenarios", nargs="+", default=["cold", "warm", "rerun"], choices=["cold", "warm", "rerun"])
+    ap.add_argument("--no-mem", action="store_true", help="skip tracemalloc (it slows allocation-heavy stages)")
+    ap.add_argument("--cache-dir", default=None, help="disk cache location (default: a temp dir, removed after)")
+    ap.add_argument("--json", default=None, help="also write results to this file")
+    args = ap.parse_args()
+
+    cache_dir = Path(args.cache_dir) if args.cache_dir else Path(tempfile.mkdtemp(prefix="rpr-bench-"))
+    os.environ["RPR_CACHE_DIR"] = str(cache_dir)
+
+    import streamlit as st
+    import streamlit.logger
+    streamlit.logger.set_log_level("error")
+
+    import webdav_client
+    from config import WEBDAV_BASE, WEBDAV_FOLDER, FETCH_WORKERS, POPUP_CHART
+    from mock_webdav import MockWebDAV
+    from parsing import (discover_headers, fill_coverage, load_in_background, parse_station_bytes, station_chart,
+                         station_store)
+    from synthetic import synthetic_network
+    from ui_map import cached_map, map_mode_for
+
+    chart = args.chart or POPUP_CHART
+    files = synthetic_network(args.stations, args.rows, args.seps, args.folders)
+    mock = MockWebDAV(files, urljoin(WEBDAV_BASE, WEBDAV_FOLDER), args.latency_ms / 1000).install(webdav_client._session)
+    total_mb = sum(len(b) for b in files.values()) / 1e6
+    print(f"{args.stations} stations x {args.rows:,} rows ({total_mb:.1f} MB), seps={args.seps}, "
+          f"latency={args.latency_ms:g} ms, workers={FETCH_WORKERS}, chart={chart}, cache={cache_dir}")
+
+    results = {"params": vars(args) | {"total_mb": total_mb, "fetch_workers": FETCH_WORKERS}, "scenarios": {}}
+    try:
+        for scenario in args.scenarios:
+            if scenario == "cold":
+                shutil.rmtree(cache_dir, ignore_errors=True)
+            if scenario in ("cold", "warm"):
+                st.cache_data.clear()
+                st.cache_resource.clear()
+                station_store.clear()
+                webdav_client.invalidate_listing()
+            mock.reset_counters()
+            stages = {}
+            if not args.no_mem:
+                tracemalloc.start()
+            t0 = time.perf_counter()
+            with _stage(stages, "list"):
+                items, snapshot = webdav_client.remote_listing()
+            with _stage(stages, "headers"):
+                stations = discover_headers(snapshot)
+            with _stage(stages, "series"):
+                while True:
+                    stations, progress = fill_coverage(stations)
+                    if not progress["pending"]:
+                        break
+                    load_in_background(stations)
+                    time.sleep(0.005)
+            with _stage(stages, "charts"):
+                if chart != "none":
+                    for s in stations.values():
+                        station_chart(s["path"], s["cache_key"], chart)
+            with _stage(stages, "map"):
+                mode = args.map_mode or map_mode_for(len(stations))
+                html = cached_map(snapshot, stations, mode).get_root().render()
+            wall = time.perf_counter() - t0
+            peak = tracemalloc.get_traced_memory()[1] / 1e6 if not args.no_mem else float("nan")
+            if not args.no_mem:
+                tracemalloc.stop()
+            results["scenarios"][scenario] = {
+                "wall_s": wall, "stages_s": stages, "peak_mb": peak, "stations": len(stations),
+                "requests": mock.requests, "bytes_served": mock.bytes_sent, "map_html_bytes": len(html),
+            }
+
+        # Download and parse on their own, to split the cold "series" figure.
+        mock.reset_counters()
+        paths = [webdav_client.RemoteTxt(it["name"], it["href"], it["etag"], it["mtime"], it["size"]) for it in items]
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(1, FETCH_WORKERS)) as pool:
+            blobs = list(pool.map(lambda p: p.read_bytes(), paths))
+        t_download = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        for p, b in zip(paths, blobs):
+            parse_station_bytes(b, p.name)
+        t_parse = time.perf_counter() - t0
+        results["breakdown_s"] = {"download": t_download, "parse": t_parse}
+    finally:
+        if not args.cache_dir:
+            shutil.rmtree(cache_dir, ignore_errors=True)
+
+    print(f"\n{'scenario':>8} {'wall s':>8} {'list':>7} {'headers':>8} {'series':>7} {'charts':>7} {'map':>7} "
+          f"{'peak MB':>8} {'requests':>9} {'MB served':>10} {'map KB':>7}")
+    for name, r in results["scenarios"].items():
+        st_ = r["stages_s"]
+        print(f"{name:>8} {r['wall_s']:>8.2f} {st_['list']:>7.2f} {st_['headers']:>8.2f} {st_['series']:>7.2f} "
+              f"{st_['charts']:>7.2f} "
+              f"{st_['map']:>7.2f} {r['peak_mb']:>8.1f} {r['requests']:>9} {r['bytes_served'] / 1e6:>10.1f} "
+              f"{r['map_html_bytes'] / 1024:>7.0f}")
+    b = results["breakdown_s"]
+    print(f"\nisolated: download {b['download']:.2f} s ({FETCH_WORKERS} workers), parse {b['parse']:.2f} s (1 thread)")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+"""Synthetic station files in the dashboard's format.
+
+"# key: value" header lines, a column header, then delimited DateTime/height
+rows, as the GNSS stations on Sciebo produce them.
+"""
+import numpy as np
+import pandas as pd
+
+SEPS = {",": ",", ";": ";", "tab": "\t", "|": "|"}
+
+
+def synthetic_station(rows: int, sep: str = ",", station: str = "BENCH",
+                      lat: float = 50.73, lon: float = 7.10, seed: int = 0) -> bytes:
+    t = np.datetime64("2015-01-01T00:00:00") + np.arange(rows) * np.timedelta64(300, "s")
+    v = 100 + np.sin(np.arange(rows) / 288.0) + np.random.default_rng(seed).normal(0, 0.02, rows)
+    head = (f"# Station: {station}\n# Latitude: {lat:.5f}\n# Longitude: {lon:.5f}\n"
+            f"# Location: Bonn\n# Water body: Rhine\n# Sensor type: GNSS-IR\n# Units: m\n")
+    body = pd.DataFrame({"DateTime": pd.to_datetime(t).strftime("%Y-%m-%d %H:%M:%S"), "Height": v})
+    return (head + body.to_csv(sep=sep, index=False, float_format="%.3f")).encode()
+
+
+def synthetic_network(stations: int, rows: int, seps=(",",), folders: int = 1) -> dict:
+    """{relative path: file bytes} for a network of stations spread over `folders` subfolders.
+
+    Delimiters in `seps` (keys of SEPS) are assigned round-robin.
+    """
+    rng = np.random.default_rng(42)
+    files = {}
+    for i in range(stations):
+        sid = f"S{i:04d}"
+        sep = SEPS[seps[i % len(seps)]]
+        folder = f"site{i % folders:02d}/" if folders > 1 else ""
+        files[f"{folder}{sid}_levels.txt"] = synthetic_station(
+            rows, sep, sid, lat=float(rng.uniform(-35, 60)), lon=float(rng.uniform(-20, 50)), seed=i)
+    return files
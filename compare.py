@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+
+from pyramid import LEVELS, bucket_centres, range_query
+
+
+def _resample(t: np.ndarray, v: np.ndarray, grid: np.ndarray, max_dist: int) -> np.ndarray:
+    """Linear interpolation of (t, v) at grid.
+
+    NaN outside the data and inside gaps: grid points farther than max_dist
+    (or twice the typical sample spacing, if larger) from any sample.
+    """
+    ok = np.isfinite(v)
+    t, v = t[ok], v[ok].astype("float64")
+    if t.size == 0:
+        return np.full(grid.size, np.nan)
+    out = np.interp(grid, t, v, left=np.nan, right=np.nan)
+    if t.size > 1:
+        spacing = int(np.median(np.diff(t)))
+        hi = np.clip(np.searchsorted(t, grid), 1, t.size - 1)
+        near = np.minimum(np.abs(grid - t[hi - 1]), np.abs(t[hi] - grid))
+        out[near > max(max_dist, 2 * spacing)] = np.nan
+    return out
+
+def align_stations(pyramids: dict, t0: int, t1: int, points: int) -> dict:
+    """Resample several stations onto one regular time grid over [t0, t1) (epoch ns).
+
+    pyramids maps station id -> pyramid (see pyramid.build_pyramid). Each station
+    contributes the level range_query picks for `points`, so long ranges read
+    hourly/daily means rather than raw samples. Means are placed at their
+    bucket centres, so stations read at different levels line up. The grid is
+    clipped to the span the stations actually cover.
+
+    Returns {"grid": int64 ns, "stations": [id, ...], "values": float64
+    (stations x grid), "levels": {id: level name}}.
+    """
+    sel, levels = {}, {}
+    lo, hi = None, None
+    for sid, pyr in pyramids.items():
+        level, s = range_query(pyr, t0, t1, points)
+        if level == "raw":
+            t, v = s["t"], s["v"]
+        else:
+            # Aggregates are keyed by bucket start; a mean describes the bucket's middle.
+            t, v = bucket_centres(s["t"], dict(LEVELS)[level]), s["mean"]
+        sel[sid], levels[sid] = (t, v), level
+        if t.size:
+            lo = int(t[0]) if lo is None else min(lo, int(t[0]))
+            hi = int(t[-1]) if hi is None else max(hi, int(t[-1]))
+
+    names = list(sel)
+    if lo is None or points < 2:
+        return {"grid": np.zeros(0, "int64"), "stations": names,
+                "values": np.zeros((len(names), 0)), "levels": levels}
+    grid = np.linspace(max(lo, t0), min(hi, t1 - 1), points).astype("int64")
+    step = int(grid[1] - grid[0]) if grid.size > 1 else 0
+    values = np.vstack([_resample(t, v, grid, step) for t, v in sel.values()])
+    return {"grid": grid, "stations": names, "values": values, "levels": levels}
+
+def long_frame(grid: np.ndarray, names, values: np.ndarray, value_name: str = "Value") -> pd.DataFrame:
+    """DateTime/Station/value rows for a layered chart, without the NaN cells."""
+    n_st, n = values.shape
+    df = pd.DataFrame({
+        "DateTime": np.tile(grid, n_st).view("datetime64[ns]"),
+        "Station": pd.Categorical.from_codes(np.repeat(np.arange(n_st), n), categories=list(names)),
+        value_name: values.ravel(),
+    })
+    return df[np.isfinite(df[value_name].to_numpy())].reset_index(drop=True)
+
+def difference(values: np.ndarray, ref: int) -> np.ndarray:
+    """Each station minus the reference row."""
+    return values - values[ref]
+
+def lag_correlation(values: np.ndarray, ref: int, max_lag: int, min_overlap: int = 10):
+    """Normalized cross-correlation of every row with the reference row.
+
+    Returns (lags, corr) with lags in grid steps from -max_lag to max_lag and
+    corr shaped (stations x lags). A positive lag means the station trails the
+    reference. Gaps (NaN) are masked out of every sum, and lags with fewer than
+    min_overlap common samples are NaN. All rows are done in one batch of FFTs.
+    """
+    n = values.shape[1]
+    max_lag = max(0, min(max_lag, n - 1))
+    mask = np.isfinite(values)
+    with np.errstate(invalid="ignore"):
+        means = np.nanmean(np.where(mask, values, np.nan), axis=1, keepdims=True)
+    x = np.where(mask, values - means, 0.0)
+    m = mask.astype("float64")
+    size = 1 << int(np.ceil(np.log2(max(2, 2 * n))))
+
+    def xcorr(a, b):
+        # sum_t a[t] * b[t + k] for k in [-max_lag, max_lag]
+        c = np.fft.irfft(np.conj(np.fft.rfft(a, size)) * np.fft.rfft(b, size, axis=-1), size, axis=-1)
+        return np.concatenate([c[..., size - max_lag:], c[..., :max_lag + 1]], axis=-1)
+
+    num = xcorr(x[ref], x)
+    den = np.sqrt(np.clip(xcorr(x[ref] ** 2, m), 0, None) * np.clip(xcorr(m[ref], x ** 2), 0, None))
+    overlap = np.rint(xcorr(m[ref], m))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        corr = np.where((den > 0) & (overlap >= min_overlap), num / den, np.nan)
+    return np.arange(-max_lag, max_lag + 1), np.clip(corr, -1.0, 1.0)
+
+def best_lags(lags: np.ndarray, corr: np.ndarray):
+    """(lag, correlation) at the correlation peak of each row; (0, NaN) for rows with none."""
+    ok = np.isfinite(corr).any(axis=1)
+    idx = np.argmax(np.where(np.isfinite(corr), corr, -np.inf), axis=1)
+    peak = np.where(ok, corr[np.arange(corr.shape[0]), idx], np.nan)
+    return np.where(ok, lags[idx], 0), peak
@@ -1,6 +1,10 @@
 
+import os
 from pathlib import Path
-import streamlit as st  # used only to read secrets safely
+try:
+    import streamlit as st  # used only to read secrets safely
+except ImportError:  # headless tools (prewarm.py) do not need Streamlit
+    st = None
 
 # -------- Streamlit page --------
 PAGE_TITLE = "RPR Water Level System"
@@ -19,11 +23,106 @@ FOOTER_LOGO_WIDTH = 60
 MAP_INIT_CENTER = (20, 0)   # world view
 MAP_INIT_ZOOM   = 2
 MAP_HEIGHT_PX   = 580
+POPUP_CHART     = "svg"   # clicked-station chart: "svg" sparkline, "png" (matplotlib) or "none"
+MAP_MODE        = "auto"  # "markers" (rich HTML card popups), "geojson", "cluster" or "auto"
+MAP_CLUSTER_MIN = 50      # "auto" clusters markers from this many stations on
+
+# -------- Station status (map colours) --------
+# Summaries are computed once per file version; status compares the latest
+# reading with the recent distribution.
+SUMMARY_WINDOW_DAYS = 365  # percentiles (p10/p50/p90) and min/max over this window
+SUMMARY_GAP_DAYS    = 30   # longest gap between samples is reported over this window
+STATUS_STALE_HOURS  = 48   # no reading for this long marks a station "stale"
+
+# -------- Data tab chart --------
+# Ranges with more rows than the budget are downsampled before plotting;
+# narrowing the date range brings back full resolution.
+CHART_WIDTH_PX      = 1200
+CHART_POINTS_PER_PX = 2
+CHART_POINT_BUDGET  = CHART_WIDTH_PX * CHART_POINTS_PER_PX
+DOWNSAMPLE_METHOD   = "lttb"  # "lttb" or "minmax"
+# Long ranges are drawn from hourly/daily/monthly aggregates; an aggregate
+# level is skipped if it would fill less than this share of the point budget.
+PYRAMID_MIN_FILL    = 0.25
+# Compare tab: stations are resampled onto one grid of at most CHART_WIDTH_PX
+# points, fewer when many are selected so the layered chart stays this small.
+COMPARE_POINT_BUDGET = 24_000
+
+# -------- Data export --------
+# Exports are written chunk by chunk from the in-memory arrays to a temporary
+# file, never built as one frame or string.
+EXPORT_CHUNK_ROWS   = 250_000  # rows per CSV chunk / Parquet row group / Arrow record batch
+EXPORT_CONCURRENCY  = 2        # exports written at once across all sessions; others wait
+EXPORT_SPOOL_MB     = 16       # exports smaller than this stay in memory, larger ones go to disk
+
+# -------- Diagnostics --------
+# RPR_TRACE=1 times the load path (JSON lines on stderr) and adds a Diagnostics tab.
+TRACE_ENABLED = os.environ.get("RPR_TRACE", "") == "1"
+TRACE_HISTORY = 20  # reruns kept per session for the Diagnostics tab
 
 # -------- WebDAV (Sciebo) --------
-# Read from Streamlit Secrets (set these in the Cloud UI, not in Git)
-WEBDAV_BASE   = st.secrets.get("WEBDAV_BASE", "https://uni-bonn.sciebo.de/public.php/webdav/")
-WEBDAV_HOST   = st.secrets.get("WEBDAV_HOST", "https://uni-bonn.sciebo.de")
-WEBDAV_FOLDER = st.secrets.get("WEBDAV_FOLDER", "solutions/")
-WEBDAV_TOKEN  = st.secrets.get("WEBDAV_TOKEN", "")
-WEBDAV_PASS   = st.secrets.get("WEBDAV_PASS", "")
+# Read from environment variables of the same name, then the TOML file named
+# by RPR_SECRETS, then Streamlit Secrets (set these in the Cloud UI, not in Git).
+SECRETS_FILE = os.environ.get("RPR_SECRETS", "")
+
+def _file_secrets() -> dict:
+    if not SECRETS_FILE:
+        return {}
+    import tomllib
+    with open(SECRETS_FILE, "rb") as f:
+        return tomllib.load(f)
+
+_FILE_SECRETS = _file_secrets()
+
+def _secret(name: str, default: str) -> str:
+    if name in os.environ:
+        return os.environ[name]
+    if name in _FILE_SECRETS:
+        return str(_FILE_SECRETS[name])
+    if st is None:
+        return default
+    try:
+        return st.secrets.get(name, default)
+    except Exception:  # no secrets.toml at all, e.g. offline benchmarks
+        return default
+
+WEBDAV_BASE   = _secret("WEBDAV_BASE", "https://uni-bonn.sciebo.de/public.php/webdav/")
+WEBDAV_HOST   = _secret("WEBDAV_HOST", "https://uni-bonn.sciebo.de")
+WEBDAV_FOLDER = _secret("WEBDAV_FOLDER", "solutions/")
+WEBDAV_TOKEN  = _secret("WEBDAV_TOKEN", "")
+WEBDAV_PASS   = _secret("WEBDAV_PASS", "")
+LISTING_TTL_S = 60  # seconds a folder listing is reused before re-checking the server
+
+# -------- Station loading --------
+FETCH_WORKERS = 8   # parallel downloads
+PARSE_WORKERS = 0   # >0 parses in a process pool of this size; 0 parses in the download threads
+SYNC_TAIL_BYTES = 256  # overlap re-fetched on tail-append sync to verify the file was only appended to
+HEAD_BYTES = 4096   # first bytes fetched per file for the header-only discovery pass
+BACKGROUND_POLL_S = 1.5  # how often the page checks on series loading in the background
+BACKGROUND_WORKERS = 2   # background series loads; few, so parsing leaves the script thread room
+BACKGROUND_RETRY_S = 60   # a failed background load is tried again after this long
+STREAM_CHUNK_BYTES = 1 << 20  # download chunk size; files are parsed as they arrive, never held whole
+PARSE_CHUNK_ROWS   = 100_000  # rows per CSV reader chunk when parsing a download stream
+# In-memory series (int64 times + STORE_VALUE_DTYPE values, with pyramids) are
+# capped at this many MB; least recently viewed stations fall back to disk.
+STORE_MEMORY_MB   = int(os.environ.get("RPR_STORE_MB", "256"))
+STORE_VALUE_DTYPE = "float32"
+
+# -------- WebDAV transport --------
+# Every request has a connect and a per-read timeout, so a hung connection
+# fails (and is retried) instead of stalling a load. Idempotent requests are
+# retried on connection errors, 429 and 5xx with jittered exponential backoff
+# (Retry-After is honoured).
+HTTP_POOL_SIZE       = max(FETCH_WORKERS, BACKGROUND_WORKERS) + 2  # pooled connections per host
+HTTP_CONNECT_TIMEOUT = 5.0    # seconds to establish a connection
+HTTP_READ_TIMEOUT    = 30.0   # seconds to wait for the next bytes of a response
+HTTP_RETRIES         = 3      # retries per request after the first attempt
+HTTP_BACKOFF_S       = 0.5    # backoff base: 0.5, 1, 2 s ... between retries
+HTTP_BACKOFF_MAX_S   = 10.0
+HTTP_BACKOFF_JITTER_S = 0.5   # up to this much random delay added to each backoff
+HTTP_LATENCY_SAMPLES = 500    # recent requests kept per method for the latency percentiles
+
+# -------- Disk cache --------
+# Parsed station series survive process restarts here; entries are keyed by
+# the WebDAV name|href|etag|mtime|size of the file they came from.
+CACHE_DIR = Path(os.environ.get("RPR_CACHE_DIR", ".rpr_cache"))
@@ -0,0 +1,277 @@
+import base64
+import json
+import hashlib
+import os
+import threading
+import zipfile
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows: only the in-process lock applies
+    fcntl = None
+
+from config import CACHE_DIR
+from pyramid import to_arrays, from_arrays
+from station_index import summarize, is_current
+
+# Layout under CACHE_DIR:
+#   manifest.json        {href: {"key", "stem", "etag", "meta", "summary", "sync"}}
+#                        (summary: see station_index.summarize)
+#   manifest.lock        flock'd while a process rewrites manifest.json
+#   series/<stem>.npz    t = int64 epoch ns, v = float64 values,
+#                        plus <level>_<field> pyramid aggregates when stored
+#   charts/<stem>.<renderer>  rendered popup chart (SVG markup or base64 PNG)
+_MANIFEST = "manifest.json"
+_MANIFEST_LOCK = "manifest.lock"
+_SERIES_DIR = "series"
+_CHARTS_DIR = "charts"
+
+_lock = threading.Lock()
+_manifest: dict = {}
+_manifest_mtime = None
+
+
+def _root() -> Path:
+    return Path(CACHE_DIR)
+
+def _stem_for(cache_key: str) -> str:
+    return hashlib.sha1(cache_key.encode("utf-8")).hexdigest()
+
+def _atomic_write(path: Path, data: bytes):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+def _load_manifest() -> dict:
+    """Return the manifest, re-reading it if another process rewrote it. Caller holds _lock."""
+    global _manifest, _manifest_mtime
+    path = _root() / _MANIFEST
+    try:
+        mtime = path.stat().st_mtime_ns
+    except OSError:
+        # No manifest on disk (first run, or the cache dir was wiped).
+        _manifest, _manifest_mtime = {}, None
+        return _manifest
+    if mtime != _manifest_mtime:
+        try:
+            _manifest = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            _manifest = {}
+        _manifest_mtime = mtime
+    return _manifest
+
+@contextmanager
+def _manifest_update():
+    """Yield the manifest for a read-modify-write that other processes cannot interleave with.
+
+    Holds _lock and an exclusive flock on manifest.lock (prewarm.py may run
+    next to the app), and re-reads the manifest from disk under it.
+    """
+    global _manifest_mtime
+    with _lock:
+        _root().mkdir(parents=True, exist_ok=True)
+        with open(_root() / _MANIFEST_LOCK, "a+b") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            _manifest_mtime = None  # mtime can miss a write in the same tick
+            yield _load_manifest()
+
+def _save_manifest():
+    global _manifest_mtime
+    path = _root() / _MANIFEST
+    _atomic_write(path, json.dumps(_manifest, ensure_ascii=False).encode("utf-8"))
+    _manifest_mtime = path.stat().st_mtime_ns
+
+def _series_path(stem: str) -> Path:
+    return _root() / _SERIES_DIR / f"{stem}.npz"
+
+def _chart_path(stem: str, renderer: str) -> Path:
+    return _root() / _CHARTS_DIR / f"{stem}.{renderer}"
+
+
+def load_series(href: str, cache_key: str):
+    """Return (meta, df) for href if the stored version matches cache_key, else None."""
+    with _lock:
+        entry = _load_manifest().get(href)
+    if not entry or entry.get("key") != cache_key:
+        return None
+    try:
+        with np.load(_series_path(entry["stem"])) as z:
+            t, v = z["t"], z["v"]
+    except (OSError, KeyError, ValueError):
+        return None
+    df = pd.DataFrame({"DateTime": pd.to_datetime(t, unit="ns"), "Value": v})
+    return dict(entry["meta"]), df
+
+def load_pyramid(href: str, cache_key: str):
+    """Return (meta, pyramid) stored for href at cache_key, or None if absent or stale."""
+    with _lock:
+        entry = _load_manifest().get(href)
+    if not entry or entry.get("key") != cache_key:
+        return None
+    try:
+        with np.load(_series_path(entry["stem"])) as z:
+            return dict(entry["meta"]), from_arrays(z["t"], z["v"], z)
+    except (OSError, KeyError, ValueError):
+        return None
+
+@contextmanager
+def open_values(href: str, cache_key: str):
+    """Chunked access to the stored float64 values of href at cache_key.
+
+    Yields read(i, j) -> v[i:j], reading only those rows from the .npz, or
+    None if that version is not stored.
+    """
+    with _lock:
+        entry = _load_manifest().get(href)
+    if not entry or entry.get("key") != cache_key:
+        yield None
+        return
+    try:
+        zf = zipfile.ZipFile(_series_path(entry["stem"]))
+    except (OSError, zipfile.BadZipFile):
+        yield None
+        return
+    with zf, zf.open("v.npy") as f:
+        version = np.lib.format.read_magic(f)
+        read_header = np.lib.format.read_array_header_1_0 if version == (1, 0) else np.lib.format.read_array_header_2_0
+        (n,), _, dtype = read_header(f)
+        start = f.tell()
+
+        def read(i: int, j: int) -> np.ndarray:
+            i, j = max(0, i), min(j, n)
+            f.seek(start + i * dtype.itemsize)
+            return np.frombuffer(f.read(max(0, j - i) * dtype.itemsize), dtype)
+
+        read.size = n
+        yield read
+
+def load_summary(href: str, cache_key: str):
+    """Return (meta, summary) for href at cache_key, or None if that version is not stored.
+
+    Normally read from the manifest alone (see station_index.summarize); a
+    summary from an older format is recomputed from the stored series once.
+    """
+    with _lock:
+        entry = _load_manifest().get(href)
+    if not entry or entry.get("key") != cache_key:
+        return None
+    path = _series_path(entry["stem"])
+    if not path.exists():
+        return None
+    if is_current(entry.get("summary")):
+        return dict(entry["meta"]), dict(entry["summary"])
+    try:
+        with np.load(path) as z:
+            summary = summarize(z["t"], z["v"])
+    except (OSError, KeyError, ValueError):
+        return None
+    try:
+        with _manifest_update() as manifest:
+            if manifest.get(href, {}).get("key") == cache_key:
+                manifest[href]["summary"] = summary
+                _save_manifest()
+    except OSError:
+        pass
+    return dict(entry["meta"]), summary
+
+def load_chart(cache_key: str, renderer: str):
+    """Stored popup chart for a file version, or None."""
+    try:
+        return _chart_path(_stem_for(cache_key), renderer).read_text(encoding="utf-8")
+    except OSError:
+        return None
+
+def store_chart(cache_key: str, renderer: str, chart: str):
+    try:
+        _atomic_write(_chart_path(_stem_for(cache_key), renderer), chart.encode("utf-8"))
+    except OSError:
+        pass
+
+def sync_state(href: str):
+    """Return what tail-append sync needs to know about the stored version of href, or None.
+
+    Keys: "key" (cache key of the stored version), "size" (bytes consumed),
+    "tail" (last bytes of the file as bytes), "layout" (delimiter, columns and
+    datetime format detected for the file).
+    """
+    with _lock:
+        entry = _load_manifest().get(href)
+    sync = (entry or {}).get("sync")
+    if not sync or "layout" not in sync:
+        return None
+    return {"key": entry["key"], "size": int(sync["size"]),
+            "tail": base64.b64decode(sync["tail"]), "layout": sync["layout"]}
+
+def stored_etag(href: str) -> str:
+    """ETag of the version of href on disk ("" if none or unknown), for conditional requests."""
+    with _lock:
+        entry = _load_manifest().get(href) or {}
+    if not entry.get("etag") or not _series_path(entry["stem"]).exists():
+        return ""
+    return entry["etag"]
+
+def rekey(href: str, cache_key: str):
+    """Re-file the stored version of href under cache_key and return (meta, df), or None.
+
+    For a listing change that left the content alone (the server answered
+    304 to the stored ETag): the series, its charts and summary are kept.
+    """
+    stem = _stem_for(cache_key)
+    try:
+        with _manifest_update() as manifest:
+            entry = manifest.get(href)
+            if not entry:
+                return None
+            if entry["stem"] != stem:
+                os.replace(_series_path(entry["stem"]), _series_path(stem))
+                for chart in (_root() / _CHARTS_DIR).glob(f"{entry['stem']}.*"):
+                    try:
+                        os.replace(chart, chart.with_name(f"{stem}{chart.suffix}"))
+                    except OSError:
+                        pass
+            entry.update(key=cache_key, stem=stem)
+            _save_manifest()
+    except OSError:
+        return None
+    return load_series(href, cache_key)
+
+def store_series(href: str, cache_key: str, meta: dict, df: pd.DataFrame, sync: dict | None = None,
+                 pyramid: dict | None = None, etag: str = ""):
+    """Persist a parsed series for href, replacing any older version of that file.
+
+    sync, if given, carries {"size", "tail", "layout"} so a grown file can later
+    be synced by fetching only the bytes past "size". pyramid, if given, is
+    saved alongside the series for load_pyramid. etag is the file's ETag,
+    sent back as If-None-Match when this href's listing entry changes.
+    """
+    stem = _stem_for(cache_key)
+    t = df["DateTime"].to_numpy(dtype="datetime64[ns]").view("int64")
+    v = df["Value"].to_numpy(dtype="float64")
+    try:
+        path = _series_path(stem)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{stem}.{os.getpid()}.{threading.get_ident()}.tmp.npz")
+        np.savez(tmp, t=t, v=v, **(to_arrays(pyramid) if pyramid is not None else {}))
+        os.replace(tmp, path)
+        with _manifest_update() as manifest:
+            old = manifest.get(href)
+            manifest[href] = {"key": cache_key, "stem": stem, "etag": etag, "meta": meta, "summary": summarize(t, v)}
+            if sync is not None:
+                manifest[href]["sync"] = {"size": int(sync["size"]), "layout": sync["layout"],
+                                          "tail": base64.b64encode(sync["tail"]).decode("ascii")}
+            _save_manifest()
+        if old and old.get("stem") != stem:
+            _series_path(old["stem"]).unlink(missing_ok=True)
+            for chart in (_root() / _CHARTS_DIR).glob(f"{old['stem']}.*"):
+                chart.unlink(missing_ok=True)
+    except OSError:
+        # A read-only or full disk only costs us the warm start, never the page.
+        pass
@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+
+from config import DOWNSAMPLE_METHOD
+
+
+def _as_float_x(t) -> np.ndarray:
+    """Timestamps (datetime64 or int64 ns) as float seconds from the first sample."""
+    t = np.asarray(t)
+    if t.dtype.kind == "M":
+        t = t.astype("datetime64[ns]").view("int64")
+    t = t.astype("int64")
+    return (t - t[0]) / 1e9 if t.size else t.astype("float64")
+
+def minmax_indices(y, n_out: int) -> np.ndarray:
+    """Indices keeping the lowest and highest sample of each of n_out // 2 equal-count buckets."""
+    y = np.asarray(y, dtype="float64")
+    n = y.size
+    n_buckets = max(1, n_out // 2)
+    if n <= n_out:
+        return np.arange(n)
+    k = -(-n // n_buckets)  # ceil
+    padded = np.full(n_buckets * k, np.nan)
+    padded[:n] = y
+    padded = padded.reshape(n_buckets, k)
+    valid = ~np.isnan(padded).all(axis=1)
+    offs = np.arange(n_buckets)[valid] * k
+    lo = offs + np.nanargmin(padded[valid], axis=1)
+    hi = offs + np.nanargmax(padded[valid], axis=1)
+    return np.unique(np.concatenate([[0, n - 1], lo, hi]))
+
+def lttb_indices(x, y, n_out: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets: indices of n_out samples that keep the visual shape.
+
+    Bucket bounds and next-bucket averages are computed up front with NumPy;
+    only the argmax per bucket (which depends on the previous pick) runs in a loop.
+    """
+    x = _as_float_x(x)
+    y = np.asarray(y, dtype="float64")
+    n = y.size
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    every = (n - 2) / (n_out - 2)
+    edges = (np.arange(n_out - 1) * every).astype("int64") + 1
+    edges[-1] = n - 1
+    cx = np.concatenate([[0.0], np.cumsum(x)])
+    cy = np.concatenate([[0.0], np.cumsum(y)])
+    # Average of bucket i+1 (the last "bucket" is the final point).
+    nxt_lo = edges[1:]
+    nxt_hi = np.append(edges[2:], n)
+    cnt = nxt_hi - nxt_lo
+    avg_x = (cx[nxt_hi] - cx[nxt_lo]) / cnt
+    avg_y = (cy[nxt_hi] - cy[nxt_lo]) / cnt
+
+    out = np.empty(n_out, dtype="int64")
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        xs, ys = x[lo:hi], y[lo:hi]
+        area = np.abs((x[a] - avg_x[i]) * (ys - y[a]) - (x[a] - xs) * (avg_y[i] - y[a]))
+        a = lo + int(np.argmax(area))
+        out[i + 1] = a
+    return out
+
+def downsample_df(df: pd.DataFrame, budget: int, method: str = DOWNSAMPLE_METHOD) -> pd.DataFrame:
+    """Reduce a DateTime/Value frame to about `budget` rows, or return it unchanged if it fits."""
+    if len(df) <= budget:
+        return df
+    df = df[df["Value"].notna()]
+    if method == "minmax":
+        idx = minmax_indices(df["Value"].to_numpy(dtype="float64"), budget)
+    else:
+        idx = lttb_indices(df["DateTime"].to_numpy(), df["Value"].to_numpy(dtype="float64"), budget)
+    return df.iloc[idx]
@@ -0,0 +1,170 @@
+"""Range export of station series as CSV, Parquet or Arrow IPC.
+
+Rows are written in chunks to a spooled temporary file, so the peak memory of
+an export is one chunk regardless of how many stations and years it covers.
+Times come from the StationStore arrays; values are read chunk by chunk from
+the float64 series in the disk cache, so they are the file's own numbers
+(the store's float32 copy, widened, is only used if the disk copy is
+missing). All formats are long tables of Station, DateTime, Value (float64);
+station header metadata, plus "value_dtype" naming the precision the values
+came from, travels as "#" comment lines (CSV) or schema metadata (Parquet /
+Arrow, key "rpr:stations", JSON).
+"""
+import json
+import tempfile
+import threading
+from contextlib import ExitStack, contextmanager
+
+import numpy as np
+
+import disk_cache
+import tracing
+from config import EXPORT_CHUNK_ROWS, EXPORT_CONCURRENCY, EXPORT_SPOOL_MB
+
+# name -> (file extension, MIME type)
+FORMATS = {
+    "CSV":       (".csv",     "text/csv"),
+    "Parquet":   (".parquet", "application/vnd.apache.parquet"),
+    "Arrow IPC": (".arrow",   "application/vnd.apache.arrow.file"),
+}
+
+_slots = threading.BoundedSemaphore(EXPORT_CONCURRENCY)
+
+
+def _widened(v: np.ndarray):
+    def read(i: int, j: int) -> np.ndarray:
+        return v[i:j].astype("float64")
+    return read
+
+@contextmanager
+def value_sources(records):
+    """{station id: (read(i, j) -> float64 values, value dtype)} for the records, open for the export."""
+    with ExitStack() as stack:
+        sources = {}
+        for rec in records:
+            read = stack.enter_context(disk_cache.open_values(rec.href, rec.cache_key))
+            if read is not None and read.size == rec.t.size:
+                sources[rec.sid] = (read, "float64")
+            else:
+                sources[rec.sid] = (_widened(rec.v), str(rec.v.dtype))
+        yield sources
+
+def iter_chunks(records, sources: dict, t0: int, t1: int, chunk_rows: int = EXPORT_CHUNK_ROWS):
+    """(station id, t, v) for each record over [t0, t1), at most chunk_rows rows at a time.
+
+    t is a view of the store array; v is float64 read from sources (see value_sources).
+    """
+    for rec in records:
+        read = sources[rec.sid][0]
+        lo, hi = np.searchsorted(rec.t, [t0, t1])
+        for i in range(lo, hi, chunk_rows):
+            j = min(i + chunk_rows, hi)
+            yield rec.sid, rec.t[i:j], read(i, j)
+
+# CSV time units, coarsest first, with their size in ns.
+_TIME_UNITS = (("s", 10**9), ("ms", 10**6), ("us", 10**3), ("ns", 1))
+
+def _time_unit(records, t0: int, t1: int, chunk_rows: int) -> str:
+    """Coarsest of _TIME_UNITS that holds every time in [t0, t1) exactly, for the whole export."""
+    finest = 0
+    for rec in records:
+        lo, hi = np.searchsorted(rec.t, [t0, t1])
+        for i in range(lo, hi, chunk_rows):
+            t = rec.t[i:min(i + chunk_rows, hi)]
+            while finest < len(_TIME_UNITS) - 1 and (t % _TIME_UNITS[finest][1]).any():
+                finest += 1
+    return _TIME_UNITS[finest][0]
+
+def station_metadata(records, sources: dict) -> dict:
+    return {rec.sid: {**rec.meta, "value_dtype": sources[rec.sid][1]} for rec in records}
+
+def _arrow_batches(records, sources, t0, t1, chunk_rows):
+    """(schema, record batch iterator) with a Station dictionary shared by every batch."""
+    import pyarrow as pa
+
+    sids = [rec.sid for rec in records]
+    code = {sid: i for i, sid in enumerate(sids)}
+    names = pa.array(sids, pa.string())
+    schema = pa.schema(
+        [("Station", pa.dictionary(pa.int32(), pa.string())), ("DateTime", pa.timestamp("ns")),
+         ("Value", pa.float64())],
+        metadata={"rpr:stations": json.dumps(station_metadata(records, sources), default=str)},
+    )
+
+    def batches():
+        for sid, t, v in iter_chunks(records, sources, t0, t1, chunk_rows):
+            station = pa.DictionaryArray.from_arrays(pa.array(np.full(t.size, code[sid], "int32")), names)
+            yield pa.record_batch([station, pa.array(t, pa.timestamp("ns")), pa.array(v, pa.float64())],
+                                  schema=schema)
+
+    return schema, batches()
+
+def _write_csv(records, sources, t0, t1, f, chunk_rows) -> int:
+    import pyarrow as pa
+    import pyarrow.csv as pcsv
+
+    for sid, meta in station_metadata(records, sources).items():
+        for k, v in meta.items():
+            line = str(v).replace("\n", " ")
+            f.write(f"# {sid} {k}: {line}\n".encode())
+    f.write(b"Station,DateTime,Value\n")
+    options = pcsv.WriteOptions(include_header=False, quoting_style="none")
+    # Whole seconds print as "YYYY-MM-DD HH:MM:SS"; one unit for every row, only as fine as the data needs.
+    unit = _time_unit(records, t0, t1, chunk_rows)
+    _, batches = _arrow_batches(records, sources, t0, t1, chunk_rows)
+    rows = 0
+    for batch in batches:
+        when = batch.column(1).cast(pa.timestamp(unit))
+        pcsv.write_csv(pa.table([batch.column(0), when, batch.column(2)], names=batch.schema.names), f, options)
+        rows += batch.num_rows
+    return rows
+
+def _write_parquet(records, sources, t0, t1, f, chunk_rows) -> int:
+    import pyarrow.parquet as pq
+
+    schema, batches = _arrow_batches(records, sources, t0, t1, chunk_rows)
+    rows = 0
+    with pq.ParquetWriter(f, schema, compression="zstd") as writer:
+        for batch in batches:
+            writer.write_batch(batch)  # one row group per chunk
+            rows += batch.num_rows
+    return rows
+
+def _write_arrow(records, sources, t0, t1, f, chunk_rows) -> int:
+    import pyarrow as pa
+
+    schema, batches = _arrow_batches(records, sources, t0, t1, chunk_rows)
+    rows = 0
+    with pa.ipc.new_file(f, schema) as writer:
+        for batch in batches:
+            writer.write_batch(batch)
+            rows += batch.num_rows
+    return rows
+
+_WRITERS = {"CSV": _write_csv, "Parquet": _write_parquet, "Arrow IPC": _write_arrow}
+
+def write_export(records, t0: int, t1: int, fmt: str, f, chunk_rows: int = EXPORT_CHUNK_ROWS) -> int:
+    """Write records over [t0, t1) (epoch ns) to the binary file f in format fmt; returns the rows written.
+
+    At most EXPORT_CONCURRENCY exports run at once process-wide; further
+    callers wait for a slot.
+    """
+    if fmt not in _WRITERS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    with _slots, tracing.span("export", fmt=fmt, stations=len(records)), value_sources(records) as sources:
+        return _WRITERS[fmt](records, sources, t0, t1, f, chunk_rows)
+
+def export_file(records, t0: int, t1: int, fmt: str):
+    """write_export into a spooled temporary file, rewound for reading (spills to disk past EXPORT_SPOOL_MB)."""
+    f = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_MB << 20, prefix="rpr-export-")
+    try:
+        write_export(records, t0, t1, fmt, f)
+    except BaseException:
+        f.close()
+        raise
+    f.seek(0)
+    return f
+
+def export_name(sids, from_d, to_d, fmt: str) -> str:
+    head = sids[0] if len(sids) == 1 else f"{len(sids)}_stations"
+    return f"rpr_{head}_{from_d:%Y%m%d}-{to_d:%Y%m%d}{FORMATS[fmt][0]}"
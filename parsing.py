@@ -1,12 +1,29 @@
 
+import codecs
+import functools
 import re
-from io import StringIO
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from datetime import datetime
+from io import BufferedReader, BytesIO, RawIOBase
 from pathlib import Path
+import numpy as np
 import pandas as pd
-import streamlit as st
 
-from utils import fig_png_b64
-from webdav_client import list_remote_txts, remote_snapshot_hash, RemoteTxt
+import disk_cache
+import tracing
+from singleflight import SingleFlight
+from st_compat import cache_data, warn
+from pyramid import build_pyramid
+from station_index import summarize
+from station_store import StationRecord, StationStore, compact_pyramid
+from config import (
+    FETCH_WORKERS, PARSE_WORKERS, SYNC_TAIL_BYTES, HEAD_BYTES, BACKGROUND_WORKERS, BACKGROUND_RETRY_S, PARSE_CHUNK_ROWS,
+    POPUP_CHART, STORE_MEMORY_MB, STORE_VALUE_DTYPE,
+)
+from utils import fig_png_b64, sparkline_svg
+from webdav_client import list_remote_txts, remote_snapshot_hash, NotModified, RemoteTxt
 
 # ---- metadata parsing helpers ----
 META_RE = re.compile(r"^#\s*([^:]+)\s*:\s*(.*)$")
@@ -27,87 +44,672 @@ def _to_float_any(x):
         return None
     return float(m.group(0).replace(",", "."))
 
-@st.cache_data(show_spinner=False)
-def load_station_file(_path, cache_key: str):
-    """Parse a station .txt (remote path-like) and return (meta, df)."""
-    lines = _path.read_text(encoding="utf-8", errors="ignore").splitlines()
+# ---- station file parsing ----
+_DELIMITERS = [",", ";", "\t", "|"]
+_WHITESPACE = r"\s+"
+# Year-first formats read the same whichever row they are detected from.
+_DT_FORMATS = [
+    "%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%dT%H:%M",
+    "%Y-%m-%d %H:%M:%S.%f", "%Y-%m-%dT%H:%M:%S.%f", "%Y/%m/%d %H:%M:%S", "%Y/%m/%d %H:%M", "%Y-%m-%d",
+]
+# Dot and slash dates: month-first as pandas reads them, day-first only if the
+# sample rows rule month-first out (a first field above 12).
+_DM_FORMATS = [
+    ("%m/%d/%Y %H:%M:%S", "%d/%m/%Y %H:%M:%S"), ("%m/%d/%Y %H:%M", "%d/%m/%Y %H:%M"),
+    ("%m.%d.%Y %H:%M:%S", "%d.%m.%Y %H:%M:%S"), ("%m.%d.%Y %H:%M", "%d.%m.%Y %H:%M"),
+]
+_DT_SAMPLE_ROWS = 500  # data rows the datetime format is settled from
 
+def _read_meta(data: bytes):
+    """Parse the leading '# key: value' lines; return (meta, byte offset of the first other line)."""
     meta = {}
-    data_start = 0
-    for i, line in enumerate(lines):
-        if line.startswith("#"):
-            m = META_RE.match(line)
-            if m:
-                meta[_clean_key(m.group(1))] = m.group(2).strip()
-        else:
-            data_start = i
-            break
+    pos = len(codecs.BOM_UTF8) if data.startswith(codecs.BOM_UTF8) else 0
+    n = len(data)
+    while pos < n and data[pos] == 0x23:  # "#"
+        end = data.find(b"\n", pos)
+        if end < 0:
+            end = n
+        m = META_RE.match(data[pos:end].decode("utf-8", errors="ignore").rstrip("\r"))
+        if m:
+            meta[_clean_key(m.group(1))] = m.group(2).strip()
+        pos = end + 1
+    return meta, min(pos, n)
 
-    if "station" not in meta:
-        meta["station"] = _path.stem.split("_")[0]
-    meta["file"] = str(_path)
+def _next_line(data: bytes, pos: int):
+    """Next non-blank, non-comment line at or after pos, as (text, offset after it)."""
+    n = len(data)
+    while pos < n:
+        end = data.find(b"\n", pos)
+        if end < 0:
+            end = n
+        line = data[pos:end].decode("utf-8", errors="ignore").strip()
+        pos = end + 1
+        if line and not line.startswith("#"):
+            return line, pos
+    return "", n
 
-    csv_text = "\n".join(lines[data_start:])
-    df = pd.read_csv(StringIO(csv_text), comment="#", sep=None, engine="python")
-    df.columns = [c.strip() for c in df.columns]
+def _split_fields(line: str, sep: str):
+    parts = line.split() if sep == _WHITESPACE else line.split(sep)
+    return [p.strip().strip('"') for p in parts]
 
+def _pick_columns(columns):
+    """Return (datetime column, value column or None) by name, as the dashboard always has."""
     dt_col = None
     for pref in ["datetime", "date_time", "date", "time"]:
-        for c in df.columns:
+        for c in columns:
             if pref in c.lower():
                 dt_col = c; break
         if dt_col: break
     if not dt_col:
-        dt_col = df.columns[0]
+        dt_col = columns[0]
+
+    val_candidates = [c for c in columns if any(k in c.lower() for k in ["height","water_level","level","value"])]
+    val_col = val_candidates[0] if val_candidates else (columns[1] if len(columns) > 1 else None)
+    return dt_col, val_col
+
+def _parses(value: str, fmt: str) -> bool:
+    try:
+        datetime.strptime(value, fmt)
+        return True
+    except ValueError:
+        return False
+
+def _detect_dt_format(values):
+    """Explicit format for the sampled datetime strings, or None to let pandas infer it."""
+    for fmt in _DT_FORMATS:
+        if _parses(values[0], fmt):
+            return fmt
+    for pair in _DM_FORMATS:
+        for fmt in pair:
+            if all(_parses(v, fmt) for v in values):
+                return fmt
+    return None
+
+def _detect_layout(data: bytes, pos: int):
+    """Delimiter and column names/positions from the header and first data row.
+
+    The datetime format is settled from up to _DT_SAMPLE_ROWS rows of data.
+
+    Returns None when the file does not look like a plain delimited table; the
+    caller then falls back to pandas' sniffing reader.
+    """
+    header, after = _next_line(data, pos)
+    sample, _ = _next_line(data, after)
+    if not header or not sample:
+        return None
+    sep = _WHITESPACE
+    for d in _DELIMITERS:
+        if header.count(d) and header.count(d) == sample.count(d):
+            sep = d; break
+    columns = _split_fields(header, sep)
+    fields = _split_fields(sample, sep)
+    if len(columns) != len(fields) or len(set(columns)) != len(columns):
+        return None
+    dt_col, val_col = _pick_columns(columns)
+    if val_col is None:
+        return None
+    dt_i, val_i = columns.index(dt_col), columns.index(val_col)
+    stamps, at = [], after
+    while len(stamps) < _DT_SAMPLE_ROWS:
+        line, at = _next_line(data, at)
+        if not line or at > len(data):
+            break  # no more rows, or one cut off at the end of a partial read
+        row = _split_fields(line, sep)
+        if len(row) == len(columns):
+            stamps.append(row[dt_i])
+    return {"sep": sep, "columns": columns, "dt": dt_i, "val": val_i,
+            "dt_format": _detect_dt_format(stamps or [fields[dt_i]])}
 
-    val_candidates = [c for c in df.columns if any(k in c.lower() for k in ["height","water_level","level","value"])]
-    val_col = val_candidates[0] if val_candidates else (df.columns[1] if len(df.columns) > 1 else None)
+def _to_datetime(s: pd.Series, fmt):
+    if fmt:
+        out = pd.to_datetime(s, format=fmt, errors="coerce")
+        if not (out.isna() & s.notna()).any():
+            return _naive_utc(out)
+    return _naive_utc(pd.to_datetime(s, errors="coerce"))
+
+def _naive_utc(t: pd.Series) -> pd.Series:
+    """Timestamps with a zone (e.g. "...Z") as naive UTC, the form series are stored in."""
+    if isinstance(t.dtype, pd.DatetimeTZDtype):
+        return t.dt.tz_convert("UTC").dt.tz_localize(None)
+    return t
+
+def _read_table(buf, layout: dict, header: bool) -> pd.DataFrame:
+    cols = layout["columns"]
+    dt_name, val_name = cols[layout["dt"]], cols[layout["val"]]
+    kw = dict(sep=layout["sep"], engine="c", header=0 if header else None, names=cols,
+              usecols=[dt_name, val_name], comment="#", skipinitialspace=True,
+              encoding="utf-8", encoding_errors="ignore")
+    start = buf.tell()
+    try:
+        raw = pd.read_csv(buf, dtype={dt_name: str, val_name: "float64"}, **kw)
+    except ValueError:
+        # Non-numeric entries in the value column: read as text, coerce below.
+        buf.seek(start)
+        raw = pd.read_csv(buf, dtype={dt_name: str}, **kw)
+    return pd.DataFrame({
+        "DateTime": _to_datetime(raw[dt_name], layout["dt_format"]),
+        "Value": pd.to_numeric(raw[val_name], errors="coerce"),
+    })
+
+def _read_sniffed(buf, name: str) -> pd.DataFrame:
+    """Fallback for files the fast path cannot lay out: let pandas sniff the delimiter."""
+    df = pd.read_csv(buf, comment="#", sep=None, engine="python", encoding="utf-8", encoding_errors="ignore")
+    df.columns = [str(c).strip() for c in df.columns]
+    dt_col, val_col = _pick_columns(list(df.columns))
     if not val_col:
-        raise ValueError(f"Expected a height/value column in {Path(str(_path)).name}")
+        raise ValueError(f"Expected a height/value column in {Path(name).name}")
+    return pd.DataFrame({
+        "DateTime": pd.to_datetime(df[dt_col], errors="coerce"),
+        "Value": pd.to_numeric(df[val_col], errors="coerce"),
+    })
+
+def parse_station_bytes(data: bytes, name: str, layout: dict | None = None, header: bool = True):
+    """Parse a station .txt and return (meta, df, layout).
+
+    With header=False, data is a run of data rows only (an appended tail) and
+    layout must be the one detected for the full file.
+    """
+    with tracing.span("parse", file=name, bytes=len(data)) as sp:
+        meta, df, layout = _parse_station_bytes(data, name, layout, header)
+        sp.set(rows=len(df))
+    return meta, df, layout
+
+def _name_meta(meta: dict, name: str) -> dict:
+    if "station" not in meta:
+        meta["station"] = Path(name).stem.split("_")[0]
+    meta["file"] = name
+    return meta
+
+def _parse_station_bytes(data: bytes, name: str, layout, header: bool):
+    if header:
+        meta, pos = _read_meta(data)
+        _name_meta(meta, name)
+        if layout is None:
+            layout = _detect_layout(data, pos)
+    else:
+        meta, pos = {}, 0
+
+    buf = BytesIO(data)
+    buf.seek(pos)
+    df = _read_table(buf, layout, header) if layout is not None else _read_sniffed(buf, name)
+
+    df = df.dropna(subset=["DateTime"])
+    if not df["DateTime"].is_monotonic_increasing:
+        df = df.sort_values("DateTime", kind="stable")
+    return meta, df.reset_index(drop=True), layout
+
+# ---- streaming parse (download chunks straight into arrays) ----
+_NAT = np.iinfo("int64").min
+
+class _ChunkStream(RawIOBase):
+    """Readable file over an iterator of byte chunks.
+
+    Counts the bytes that pass through and keeps the last SYNC_TAIL_BYTES of
+    them, which is all tail-append sync needs to know about the file.
+    """
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._buf = b""
+        self.size = 0
+        self.tail = b""
+        self.eof = False
+
+    def readable(self):
+        return True
+
+    def fill(self) -> bool:
+        """Append the next chunk to the unread buffer; False at end of stream."""
+        for chunk in self._chunks:
+            if chunk:
+                self.size += len(chunk)
+                self.tail = (self.tail + chunk[-SYNC_TAIL_BYTES:])[-SYNC_TAIL_BYTES:]
+                self._buf += chunk
+                return True
+        self.eof = True
+        return False
+
+    def peek_head(self, rows: int = 1) -> bytes:
+        """Buffer until the '#' metadata, the column header and `rows` data rows are complete."""
+        while not _head_complete(self._buf, rows) and self.fill():
+            pass
+        return self._buf
+
+    def skip(self, n: int):
+        self._buf = self._buf[n:]
+
+    def readinto(self, b) -> int:
+        if not self._buf and not self.fill():
+            return 0
+        n = min(len(b), len(self._buf))
+        b[:n] = self._buf[:n]
+        self._buf = self._buf[n:]
+        return n
+
+    def close(self):
+        close = getattr(self._chunks, "close", None)
+        if close is not None:
+            close()  # releases the HTTP connection if parsing stopped early
+        super().close()
+
+def _head_complete(data: bytes, rows: int) -> bool:
+    _, pos = _read_meta(data)
+    header, after = _next_line(data, pos)
+    for _ in range(rows):
+        sample, after = _next_line(data, after)
+        if not (header and sample) or after > len(data):
+            return False
+    return True
+
+class _GrowingArrays:
+    """Preallocated int64 times and float64 values, grown geometrically when full."""
+    def __init__(self, capacity: int):
+        self.n = 0
+        self.t = np.empty(max(capacity, 1024), dtype="int64")
+        self.v = np.empty(max(capacity, 1024), dtype="float64")
+
+    def extend(self, t: np.ndarray, v: np.ndarray):
+        need = self.n + t.size
+        if need > self.t.size:
+            cap = max(need, int(self.t.size * 1.5))
+            self.t.resize(cap, refcheck=False)
+            self.v.resize(cap, refcheck=False)
+        self.t[self.n:need] = t
+        self.v[self.n:need] = v
+        self.n = need
+
+    def finish(self):
+        """Trimmed (t, v), sorted by time and without unparseable timestamps."""
+        self.t.resize(self.n, refcheck=False)
+        self.v.resize(self.n, refcheck=False)
+        t, v = self.t, self.v
+        ok = t != _NAT
+        if not ok.all():
+            t, v = t[ok], v[ok]
+        if t.size > 1 and (t[1:] < t[:-1]).any():
+            order = np.argsort(t, kind="stable")
+            t, v = t[order], v[order]
+        return t, v
+
+def parse_station_stream(chunks, name: str, size_hint: int = 0):
+    """Parse a station .txt from an iterator of byte chunks; return (meta, df, sync).
+
+    Only the '#' metadata, the column header and the first _DT_SAMPLE_ROWS
+    data rows are buffered as bytes. The body goes through the CSV reader PARSE_CHUNK_ROWS at
+    a time into preallocated arrays (sized from size_hint), so peak memory stays
+    near the size of the parsed series. sync is what _sync_info would return
+    for the whole file.
+    """
+    with tracing.span("parse_stream", file=name) as sp:
+        stream = _ChunkStream(chunks)
+        try:
+            meta, df, layout = _parse_stream(stream, name, size_hint)
+        finally:
+            stream.close()
+        sp.set(bytes=stream.size, rows=len(df))
+    sync = {"size": stream.size, "tail": stream.tail, "layout": layout} if layout is not None else None
+    return meta, df, sync
+
+def _parse_stream(stream: _ChunkStream, name: str, size_hint: int):
+    head = stream.peek_head(_DT_SAMPLE_ROWS)  # as many rows as _detect_layout samples
+    meta, pos = _read_meta(head)
+    _name_meta(meta, name)
+    layout = _detect_layout(head, pos)
+    stream.skip(pos)
+    if layout is None:
+        # Irregular file: the sniffing reader needs it whole.
+        while stream.fill():
+            pass
+        buf = BytesIO(stream.read())
+        df = _read_sniffed(buf, name).dropna(subset=["DateTime"])
+        if not df["DateTime"].is_monotonic_increasing:
+            df = df.sort_values("DateTime", kind="stable")
+        return meta, df.reset_index(drop=True), None
+
+    # Rough row count from the first data line, so the arrays rarely grow.
+    _, after_header = _next_line(head, pos)
+    sample, after_sample = _next_line(head, after_header)
+    row_bytes = max(1, after_sample - after_header)
+    out = _GrowingArrays(int(max(0, size_hint - after_header) / row_bytes * 1.05))
+
+    cols = layout["columns"]
+    dt_name, val_name = cols[layout["dt"]], cols[layout["val"]]
+    reader = pd.read_csv(BufferedReader(stream), sep=layout["sep"], engine="c", header=0, names=cols,
+                         usecols=[dt_name, val_name], comment="#", skipinitialspace=True,
+                         dtype={dt_name: str}, encoding="utf-8", encoding_errors="ignore",
+                         chunksize=PARSE_CHUNK_ROWS)
+    with reader:
+        for chunk in reader:
+            t = _to_datetime(chunk[dt_name], layout["dt_format"])
+            out.extend(t.to_numpy(dtype="datetime64[ns]").view("int64"),
+                       pd.to_numeric(chunk[val_name], errors="coerce").to_numpy(dtype="float64"))
+    t, v = out.finish()
+    return meta, pd.DataFrame({"DateTime": t.view("datetime64[ns]"), "Value": v}), layout
+
+def _sync_info(data: bytes, layout):
+    if layout is None:
+        return None  # no fixed layout to parse a bare tail with
+    return {"size": len(data), "tail": data[-SYNC_TAIL_BYTES:], "layout": layout}
+
+def _append_tail(path, href: str, cache_key: str, prev: dict):
+    """Fetch only the bytes appended since the stored version and extend it.
 
-    df = df[[dt_col, val_col]].rename(columns={dt_col: "DateTime", val_col: "Value"})
-    df["DateTime"] = pd.to_datetime(df["DateTime"], errors="coerce")
-    df = df.dropna(subset=["DateTime"]).sort_values("DateTime").reset_index(drop=True)
+    Returns (meta, df), or None when a full download is needed instead: the
+    server ignored the Range, the overlap no longer matches (file rewritten),
+    the header block was edited or the stored copy is missing.
+    """
+    tail = prev["tail"]
+    if not tail.endswith(b"\n") or prev["size"] < len(tail):
+        return None
+    chunk = path.read_range(prev["size"] - len(tail))
+    if chunk is None or not chunk.startswith(tail):
+        return None
+    cached = disk_cache.load_series(href, prev["key"])
+    if cached is None:
+        return None
+    meta, df_old = cached
+    # The overlap only vouches for the end of the file; an edited header needs a full reload.
+    if _head_meta(path) != meta:
+        return None
+
+    # Only consume complete lines; a half-written last row is picked up next sync.
+    new = chunk[len(tail):]
+    new = new[: new.rfind(b"\n") + 1]
+    if new.strip():
+        _, df_new, _ = parse_station_bytes(new, str(path), layout=prev["layout"], header=False)
+        df = pd.concat([df_old, df_new], ignore_index=True)
+        if not df["DateTime"].is_monotonic_increasing:
+            df = df.sort_values("DateTime", kind="stable").reset_index(drop=True)
+    else:
+        df = df_old
+    sync = _sync_info(tail + new, prev["layout"])
+    sync["size"] = prev["size"] + len(new)
+    disk_cache.store_series(href, cache_key, meta, df, sync=sync, pyramid=_pyramid_of(df),
+                            etag=getattr(path, "etag", ""))
     return meta, df
 
-@st.cache_data(show_spinner=False)
-def discover_stations(snapshot_hash: str):
-    """Build stations dict from remote WebDAV folder."""
+def _pyramid_of(df: pd.DataFrame) -> dict:
+    return build_pyramid(df["DateTime"].to_numpy(dtype="datetime64[ns]").view("int64"),
+                         df["Value"].to_numpy(dtype="float64"))
+
+# Sessions loading the same file version at once share one fetch.
+fetch_flight = SingleFlight("fetch")
+
+def _fetch_station(path, cache_key: str, parse_pool=None):
+    """Disk cache hit, tail-append sync, or full download + parse + store.
+
+    Safe to call from worker threads. Concurrent calls for the same cache key
+    (name|href|etag|mtime|size) wait for the one already running.
+    """
+    with tracing.span("fetch_station", file=str(path)) as sp:
+        sp.set(source="shared")  # the call that actually runs overwrites this
+        return fetch_flight.do(cache_key, _fetch_station_traced, path, cache_key, parse_pool, sp)
+
+def _fetch_station_traced(path, cache_key: str, parse_pool, sp):
+    href = getattr(path, "href", str(path))
+    cached = disk_cache.load_series(href, cache_key)
+    if cached is not None:
+        sp.set(source="disk")
+        return cached
+
+    prev = disk_cache.sync_state(href)
+    if prev is not None and getattr(path, "size", 0) > prev["size"]:
+        appended = _append_tail(path, href, cache_key, prev)
+        if appended is not None:
+            sp.set(source="append")
+            return appended
+
+    # A listing change need not mean new content: offer the server the stored
+    # version's ETag and keep that copy if it answers 304.
+    try:
+        meta, df, sync = _download(path, parse_pool, disk_cache.stored_etag(href))
+    except NotModified:
+        kept = disk_cache.rekey(href, cache_key)
+        if kept is not None:
+            sp.set(source="not modified")
+            return kept
+        meta, df, sync = _download(path, parse_pool)
+    sp.set(source="full")
+    disk_cache.store_series(href, cache_key, meta, df, sync=sync, pyramid=_pyramid_of(df),
+                            etag=getattr(path, "etag", ""))
+    return meta, df
+
+def _download(path, parse_pool=None, etag: str = ""):
+    """Full download + parse: (meta, df, sync). With etag, raises NotModified if the file still has it."""
+    if parse_pool is not None:
+        # Worker processes need the file as one picklable buffer.
+        data = path.read_bytes(etag=etag) if etag else path.read_bytes()
+        meta, df, layout = parse_pool.submit(parse_station_bytes, data, str(path)).result()
+        sync = _sync_info(data, layout)
+        del data
+        return meta, df, sync
+    return parse_station_stream(path.iter_bytes(etag=etag), str(path), size_hint=getattr(path, "size", 0))
+
+def _station_head(path, cache_key: str, parse_pool=None):
+    """(meta, summary) for one file version (see station_index.summarize).
+
+    Answered from the disk cache manifest when the version is stored, so a
+    warm start (e.g. after prewarm.py) reads no series at all.
+    """
+    stored = disk_cache.load_summary(getattr(path, "href", str(path)), cache_key)
+    if stored is not None:
+        return stored
+    meta, df = _fetch_station(path, cache_key, parse_pool)
+    return meta, summarize(df["DateTime"].to_numpy(dtype="datetime64[ns]").view("int64"),
+                           df["Value"].to_numpy(dtype="float64"))
+
+def _station_entry(p, file_key: str, meta: dict, summary: dict | None) -> dict:
+    """Stations dict entry; summary None means coverage is still loading (n/t_min/t_max are None).
+
+    "summary" is the station_index summary of the file version.
+    """
+    sid = str(meta.get("station") or p.stem.split("_")[0])
+
+    lat = None
+    for k in ["latitude", "lat", "y", "northing"]:
+        lat = _to_float_any(meta.get(k))
+        if lat is not None: break
+    lon = None
+    for k in ["longitude", "lon", "long", "lng", "x", "easting", "longtitude"]:
+        lon = _to_float_any(meta.get(k))
+        if lon is not None: break
+
+    entry = {
+        "id": sid, "lat": lat, "lon": lon, "meta": meta, "path": p,
+        "n": None, "t_min": None, "t_max": None, "summary": None,
+        "units": meta.get("units") or meta.get("unit") or "",
+        "cache_key": file_key,
+    }
+    if summary is not None:
+        _set_coverage(entry, summary)
+    return entry
+
+def _set_coverage(entry: dict, summary: dict):
+    entry["summary"] = summary
+    entry["n"] = summary["n"]
+    entry["t_min"] = pd.Timestamp(summary["t_min"]) if summary["t_min"] is not None else None
+    entry["t_max"] = pd.Timestamp(summary["t_max"]) if summary["t_max"] is not None else None
+
+def _listing_paths(items):
+    paths = [RemoteTxt(name=it["name"], href=it["href"], etag=it["etag"], mtime=it["mtime"], size=it["size"])
+             for it in items]
+    return paths, [f'{p.name}|{p.href}|{p.etag}|{p.mtime}|{p.size}' for p in paths]
+
+def build_stations(items, on_skip=warn) -> dict:
+    """Stations dict for listing items: download/parse/store whatever the disk cache lacks.
+
+    Loads every series up front, for prewarm.py; the app uses discover_headers
+    and load_in_background instead. on_skip(message) reports files that failed.
+    """
+    paths, keys = _listing_paths(items)
+
+    # Downloads run FETCH_WORKERS-wide; parsing either shares those threads or,
+    # with PARSE_WORKERS > 0, runs in processes so it never waits behind the network.
+    parse_pool = ProcessPoolExecutor(PARSE_WORKERS) if PARSE_WORKERS > 0 else None
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, FETCH_WORKERS)) as pool:
+            futures = [tracing.submit(pool, _station_head, p, k, parse_pool) for p, k in zip(paths, keys)]
+            stations = {}
+            for it, p, k, fut in zip(items, paths, keys, futures):
+                try:
+                    meta, summary = fut.result()
+                    entry = _station_entry(p, k, meta, summary)
+                    stations[entry["id"]] = entry
+                except Exception as e:
+                    on_skip(f"Skipped {it['name']}: {e}")
+    finally:
+        if parse_pool is not None:
+            parse_pool.shutdown()
+    return stations
+
+# ---- two-phase discovery: headers first, series in the background ----
+def _head_meta(path) -> dict:
+    """Header metadata from the first HEAD_BYTES of a file, fetching more only if the '#' block is longer."""
+    nbytes = HEAD_BYTES
+    while True:
+        data = path.read_head(nbytes)
+        meta, pos = _read_meta(data)
+        if len(data) < nbytes or pos < len(data):
+            return _name_meta(meta, str(path))
+        nbytes *= 4  # header block not finished yet
+
+def _station_header(path, cache_key: str):
+    """(meta, summary or None): the stored version if there is one, else only the file's header."""
+    stored = disk_cache.load_summary(getattr(path, "href", str(path)), cache_key)
+    if stored is not None:
+        return stored
+    return _head_meta(path), None
+
+@cache_data(show_spinner=False)
+def discover_headers(snapshot_hash: str):
+    """Stations dict built from file headers only (one small Range request per new file).
+
+    Versions already in the disk cache come with their coverage; the others
+    have n/t_min/t_max set to None until load_in_background fills them in.
+    """
+    tracing.cache_miss()
     items = list_remote_txts()
-    stations = {}
-    for it in items:
-        try:
-            p = RemoteTxt(name=it["name"], href=it["href"], etag=it["etag"], mtime=it["mtime"], size=it["size"])
-            file_key = f'{p.name}|{p.href}|{p.etag}|{p.mtime}|{p.size}'
-            meta, df = load_station_file(p, cache_key=file_key)
-            sid = str(meta.get("station") or p.stem.split("_")[0])
-
-            lat = None
-            for k in ["latitude", "lat", "y", "northing"]:
-                lat = _to_float_any(meta.get(k))
-                if lat is not None: break
-            lon = None
-            for k in ["longitude", "lon", "long", "lng", "x", "easting", "longtitude"]:
-                lon = _to_float_any(meta.get(k))
-                if lon is not None: break
-
-            df_small = df if len(df) <= 600 else df.iloc[:: max(1, len(df)//600)]
-            chart_b64 = fig_png_b64(df_small) if not df_small.empty else ""
-
-            stations[sid] = {
-                "id": sid, "lat": lat, "lon": lon, "meta": meta, "path": p,
-                "n": len(df),
-                "t_min": df["DateTime"].min() if not df.empty else None,
-                "t_max": df["DateTime"].max() if not df.empty else None,
-                "units": meta.get("units") or meta.get("unit") or "",
-                "chart_b64": chart_b64,
-                "cache_key": file_key,
-            }
-        except Exception as e:
-            import streamlit as st
-            st.warning(f"Skipped {it['name']}: {e}")
+    paths, keys = _listing_paths(items)
+    with ThreadPoolExecutor(max_workers=max(1, FETCH_WORKERS)) as pool:
+        futures = [tracing.submit(pool, _station_header, p, k) for p, k in zip(paths, keys)]
+        stations = {}
+        for it, p, k, fut in zip(items, paths, keys, futures):
+            try:
+                meta, summary = fut.result()
+                entry = _station_entry(p, k, meta, summary)
+                stations[entry["id"]] = entry
+            except Exception as e:
+                warn(f"Skipped {it['name']}: {e}")
     return stations
 
-@st.cache_data(show_spinner=False)
-def get_series_for(_path, cache_key: str):
-    return load_station_file(_path, cache_key)
+# Process-wide, so a file is loaded once however many sessions are waiting on it.
+# A finished load is forgotten once its summary is in the disk cache (sessions
+# pick it up from there); a failed one is retried after BACKGROUND_RETRY_S.
+_bg_pool = ThreadPoolExecutor(max_workers=max(1, BACKGROUND_WORKERS), thread_name_prefix="rpr-series")
+_bg_lock = threading.Lock()
+_bg_jobs = {}    # cache_key -> Future of (meta, summary)
+_bg_failed = {}  # cache_key -> time.monotonic() of the failure
+
+def _bg_done(href: str, cache_key: str, fut):
+    if fut.exception() is not None:
+        with _bg_lock:
+            _bg_failed[cache_key] = time.monotonic()
+        return
+    if disk_cache.load_summary(href, cache_key) is not None:
+        with _bg_lock:
+            if _bg_jobs.get(cache_key) is fut:
+                del _bg_jobs[cache_key]
+
+def load_in_background(stations: dict):
+    """Start loading the series of every station whose coverage is still missing."""
+    now = time.monotonic()
+    started = []
+    with _bg_lock:
+        for key in [k for k, t in _bg_failed.items() if now - t >= BACKGROUND_RETRY_S]:
+            del _bg_failed[key]
+            _bg_jobs.pop(key, None)
+        for s in stations.values():
+            key = s["cache_key"]
+            if s["n"] is None and key not in _bg_jobs:
+                _bg_jobs[key] = _bg_pool.submit(_station_head, s["path"], key)
+                started.append((getattr(s["path"], "href", str(s["path"])), key, _bg_jobs[key]))
+    # Outside the lock: a job that already finished runs its callback right here.
+    for href, key, fut in started:
+        fut.add_done_callback(functools.partial(_bg_done, href, key))
+
+def fill_coverage(stations: dict):
+    """Copy of stations with coverage from finished background loads, plus {"pending", "failed"}.
+
+    "pending" counts stations still loading; "failed" maps station id to the
+    error, and those stations are left out of the copy.
+    """
+    out, pending, failed = {}, 0, {}
+    with _bg_lock:
+        jobs = {s["cache_key"]: _bg_jobs.get(s["cache_key"]) for s in stations.values() if s["n"] is None}
+    for sid, s in stations.items():
+        if s["n"] is None:
+            fut = jobs.get(s["cache_key"])
+            if fut is None:
+                # Finished and forgotten, or not started: the disk cache knows which.
+                stored = disk_cache.load_summary(getattr(s["path"], "href", str(s["path"])), s["cache_key"])
+                summary = stored[1] if stored is not None else None
+            elif fut.done():
+                if fut.exception() is not None:
+                    failed[sid] = fut.exception()
+                    continue  # dropped, as build_stations skips unreadable files
+                summary = fut.result()[1]
+            else:
+                summary = None
+            if summary is None:
+                pending += 1
+            else:
+                s = dict(s)
+                _set_coverage(s, summary)
+        out[sid] = s
+    return out, {"pending": pending, "failed": failed}
+
+# ---- in-memory station store ----
+def _load_record(path, cache_key: str) -> StationRecord:
+    href = getattr(path, "href", str(path))
+    stored = disk_cache.load_pyramid(href, cache_key)
+    if stored is not None:
+        meta, pyr = stored
+    else:
+        meta, df = _fetch_station(path, cache_key)
+        pyr = _pyramid_of(df)
+    sid = str(meta.get("station") or Path(str(path)).stem.split("_")[0])
+    return StationRecord(sid, href, cache_key, meta, compact_pyramid(pyr, STORE_VALUE_DTYPE))
+
+station_store = StationStore(STORE_MEMORY_MB * 2**20, _load_record)
+
+def get_station(_path, cache_key: str) -> StationRecord:
+    """Arrays and metadata for one station version, from the LRU store (loaded on demand)."""
+    return station_store.get(_path, cache_key)
+
+def get_pyramid_for(_path, cache_key: str) -> dict:
+    """Multi-resolution pyramid (see pyramid.build_pyramid) for one station version."""
+    return get_station(_path, cache_key).pyramid
+
+@cache_data(show_spinner=False, max_entries=512)
+def station_chart(_path, cache_key: str, renderer: str = POPUP_CHART) -> str:
+    """Popup chart for one station version, rendered on first request.
+
+    renderer "svg" returns inline SVG markup, "png" a base64 matplotlib PNG.
+    Rendered charts are kept in the disk cache next to the series.
+    """
+    tracing.cache_miss()
+    if renderer == "none":
+        return ""
+    chart = disk_cache.load_chart(cache_key, renderer)
+    if chart is not None:
+        return chart
+    rec = get_station(_path, cache_key)
+    if rec.t.size == 0:
+        return ""
+    with tracing.span("render_chart", renderer=renderer, rows=int(rec.t.size)):
+        if renderer == "png":
+            step = max(1, rec.t.size // 600)
+            chart = fig_png_b64(pd.DataFrame({"DateTime": rec.t[::step].view("datetime64[ns]"), "Value": rec.v[::step]}))
+        else:
+            chart = sparkline_svg(rec.t, rec.v)
+    disk_cache.store_chart(cache_key, renderer, chart)
+    return chart
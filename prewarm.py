@@ -0,0 +1,85 @@
+"""Build the dashboard's on-disk caches without Streamlit (cron / sidecar).
+
+    python prewarm.py                                   # secrets from env or .streamlit/secrets.toml
+    python prewarm.py --secrets /etc/rpr/secrets.toml --cache-dir /srv/rpr-cache
+
+Runs the listing, download + parse + pyramid, popup chart and map payload
+stages and leaves everything in the disk cache the app reads (CACHE_DIR /
+RPR_CACHE_DIR), so the first visitor after a deploy or data drop does not pay
+the cold load. Only changed files are fetched again; a grown file is synced
+by its tail. Cache writes are atomic, so this can run while the app is up.
+Exits non-zero if any station file could not be loaded.
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+
+
+def _stage(name: str, t0: float, detail: str = ""):
+    print(f"{name:<10} {time.perf_counter() - t0:>7.2f} s  {detail}", flush=True)
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--secrets", help="TOML file with the WEBDAV_* keys (sets RPR_SECRETS)")
+    ap.add_argument("--cache-dir", help="disk cache directory (sets RPR_CACHE_DIR)")
+    ap.add_argument("--charts", choices=["svg", "png", "none"], help="popup chart renderer (default: POPUP_CHART)")
+    ap.add_argument("--no-map", action="store_true", help="skip building the map payload")
+    args = ap.parse_args(argv)
+
+    # config reads these at import time.
+    if args.secrets:
+        os.environ["RPR_SECRETS"] = args.secrets
+    if args.cache_dir:
+        os.environ["RPR_CACHE_DIR"] = args.cache_dir
+    logging.basicConfig(format="%(levelname)s %(message)s")
+
+    sys.path.insert(0, str(Path(__file__).resolve().parent))
+    import config
+    import parsing
+    from webdav_client import remote_listing, transport_stats
+
+    print(f"cache dir  {Path(config.CACHE_DIR).resolve()}")
+    t_all = time.perf_counter()
+
+    t0 = time.perf_counter()
+    items, snapshot = remote_listing()
+    _stage("listing", t0, f"{len(items)} files, snapshot {snapshot[:12]}")
+
+    skipped = []
+    t0 = time.perf_counter()
+    runs_before = parsing.fetch_flight.stats()["runs"]
+    stations = parsing.build_stations(items, on_skip=skipped.append)
+    fetched = parsing.fetch_flight.stats()["runs"] - runs_before
+    _stage("stations", t0, f"{len(stations)} loaded, {fetched} fetched (not in the disk cache), {len(skipped)} skipped")
+    for msg in skipped:
+        print(f"  {msg}", file=sys.stderr)
+
+    renderer = args.charts or config.POPUP_CHART
+    t0 = time.perf_counter()
+    n_charts = 0
+    if renderer != "none":
+        for s in stations.values():
+            if parsing.station_chart(s["path"], s["cache_key"], renderer):
+                n_charts += 1
+    _stage("charts", t0, f"{n_charts} {renderer} charts")
+
+    if not args.no_map:
+        import ui_map
+        t0 = time.perf_counter()
+        mode = ui_map.map_mode_for(len(stations))
+        html = ui_map.build_map(stations, mode).get_root().render()
+        _stage("map", t0, f"{mode}, {len(html) / 1024:.0f} KB")
+
+    _stage("total", t_all)
+    for row in transport_stats.stats():
+        print(f"  {row['method']:<9} {row['requests']} requests, {row['retries']} retries, {row['errors']} errors, "
+              f"{row['not_modified']} not modified, p50 {row['p50 ms']} ms, p99 {row['p99 ms']} ms")
+    return 1 if skipped else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+import numpy as np
+
+from config import PYRAMID_MIN_FILL
+
+# Aggregate levels, finest first. Period in ns, or None for calendar months.
+LEVELS = [("hourly", 3_600 * 10**9), ("daily", 86_400 * 10**9), ("monthly", None)]
+AGG_FIELDS = ("t", "min", "mean", "max", "count")
+
+
+def _bucket_starts(t: np.ndarray, period):
+    if period is None:
+        return t.view("datetime64[ns]").astype("datetime64[M]").astype("datetime64[ns]").view("int64")
+    return t - np.mod(t, period)
+
+def bucket_centres(t: np.ndarray, period) -> np.ndarray:
+    """Midpoints of the buckets whose starts are t (the real midpoint for calendar months)."""
+    if period is None:
+        ends = (t.view("datetime64[ns]").astype("datetime64[M]") + 1).astype("datetime64[ns]").view("int64")
+        return t + (ends - t) // 2
+    return t + period // 2
+
+def aggregate(t: np.ndarray, v: np.ndarray, period) -> dict:
+    """min/mean/max/count of v per period bucket; t must be sorted int64 epoch ns."""
+    if t.size == 0:
+        return {"t": t[:0], "min": v[:0], "mean": v[:0], "max": v[:0], "count": np.zeros(0, "int64")}
+    key = _bucket_starts(t, period)
+    starts = np.flatnonzero(np.r_[True, key[1:] != key[:-1]])
+    finite = np.isfinite(v)
+    count = np.add.reduceat(finite.astype("int64"), starts)
+    total = np.add.reduceat(np.where(finite, v, 0.0), starts)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.where(count > 0, total / count, np.nan)
+    return {
+        "t": key[starts],
+        "min": np.fmin.reduceat(v, starts),
+        "mean": mean,
+        "max": np.fmax.reduceat(v, starts),
+        "count": count,
+    }
+
+def build_pyramid(t, v) -> dict:
+    """{"raw": {"t", "v"}, "hourly"|"daily"|"monthly": {"t", "min", "mean", "max", "count"}}.
+
+    Each level is built from the raw series in one vectorized pass.
+    """
+    t = np.ascontiguousarray(t, dtype="int64")
+    v = np.ascontiguousarray(v, dtype="float64")
+    pyr = {"raw": {"t": t, "v": v}}
+    for name, period in LEVELS:
+        pyr[name] = aggregate(t, v, period)
+    return pyr
+
+def to_arrays(pyr: dict) -> dict:
+    """Flatten the aggregate levels to {"<level>_<field>": array} for np.savez."""
+    return {f"{name}_{f}": pyr[name][f] for name, _ in LEVELS for f in AGG_FIELDS}
+
+def from_arrays(t, v, arrays) -> dict:
+    pyr = {"raw": {"t": t, "v": v}}
+    for name, _ in LEVELS:
+        pyr[name] = {f: arrays[f"{name}_{f}"] for f in AGG_FIELDS}
+    return pyr
+
+def ns_to_date(ns: int):
+    return np.datetime64(int(ns), "ns").astype("datetime64[D]").item()
+
+def day_bounds_ns(from_d, to_d):
+    """[from_d 00:00, day after to_d 00:00) as epoch ns, for range_query."""
+    t0 = np.datetime64(from_d, "D").astype("datetime64[ns]").view("int64")
+    t1 = (np.datetime64(to_d, "D") + 1).astype("datetime64[ns]").view("int64")
+    return int(t0), int(t1)
+
+def _slice(level: dict, t0: int, t1: int) -> dict:
+    lo, hi = np.searchsorted(level["t"], [t0, t1], side="left")
+    return {k: a[lo:hi] for k, a in level.items()}
+
+def range_query(pyr: dict, t0: int, t1: int, budget: int):
+    """Pick a level for [t0, t1) (epoch ns) and return (level name, sliced arrays).
+
+    Raw is used while it fits the point budget. Otherwise the finest aggregate
+    that fits is used, unless it would fill less than PYRAMID_MIN_FILL of the
+    chart; then the next finer level is returned and may exceed the budget, so
+    the caller downsamples it. Bounds are found by binary search, so the cost
+    does not grow with series length.
+    """
+    prev_name, prev = "raw", _slice(pyr["raw"], t0, t1)
+    if prev["t"].size <= budget:
+        return prev_name, prev
+    for name, period in LEVELS:
+        # Aggregate keys are bucket starts; include the bucket holding t0.
+        first = int(_bucket_starts(np.array([t0], dtype="int64"), period)[0])
+        sel = _slice(pyr[name], first, t1)
+        if sel["t"].size <= budget:
+            if sel["t"].size < budget * PYRAMID_MIN_FILL:
+                return prev_name, prev
+            return name, sel
+        prev_name, prev = name, sel
+    return prev_name, prev
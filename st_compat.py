@@ -0,0 +1,28 @@
+"""Streamlit when it is installed, otherwise stand-ins so the data modules
+(parsing, ui_map) also import in headless tools such as prewarm.py."""
+import logging
+
+try:
+    import streamlit as st
+except ImportError:
+    st = None
+
+_log = logging.getLogger("rpr")
+
+
+def _passthrough(fn=None, **_):
+    """Stand-in for st.cache_data / st.cache_resource: no caching, same call forms."""
+    def deco(f):
+        f.clear = lambda *a, **k: None
+        return f
+    return deco(fn) if fn is not None else deco
+
+cache_data = st.cache_data if st is not None else _passthrough
+cache_resource = st.cache_resource if st is not None else _passthrough
+
+def warn(msg: str):
+    """st.warning inside the app, a log record elsewhere."""
+    if st is not None and st.runtime.exists():
+        st.warning(msg)
+    else:
+        _log.warning(msg)
@@ -0,0 +1,75 @@
+"""Per-version station summaries: the map's status comes from these, not the series.
+
+One summary is computed (vectorized) whenever a file version is stored and
+kept in the disk cache manifest, so the whole network's freshness and level
+status is an O(stations) lookup.
+"""
+import numpy as np
+
+from config import SUMMARY_WINDOW_DAYS, SUMMARY_GAP_DAYS, STATUS_STALE_HOURS
+
+SUMMARY_VERSION = 2
+_HOUR = 3_600 * 10**9
+_DAY = 24 * _HOUR
+
+# status -> (folium.Icon color, hex for circle markers and the legend)
+STATUS_COLORS = {
+    "normal":  ("green",     "#2ca02c"),
+    "high":    ("red",       "#d62728"),
+    "low":     ("orange",    "#ff7f0e"),
+    "stale":   ("gray",      "#7f7f7f"),
+    "loading": ("lightgray", "#c7c7c7"),
+    "no data": ("lightgray", "#c7c7c7"),
+}
+
+
+def summarize(t: np.ndarray, v: np.ndarray) -> dict:
+    """Summary of one series (t sorted int64 epoch ns), JSON-safe.
+
+    Keys: n, t_min, t_max; last_t/last_v (latest finite reading) and
+    change_24h (its change against the reading about a day before);
+    min/p10/p50/p90/max of the last SUMMARY_WINDOW_DAYS; gap_s, the longest
+    gap between samples in the last SUMMARY_GAP_DAYS. Unknowns are None.
+    """
+    out = {"version": SUMMARY_VERSION, "n": int(t.size), "t_min": None, "t_max": None,
+           "last_t": None, "last_v": None, "change_24h": None,
+           "min": None, "p10": None, "p50": None, "p90": None, "max": None, "gap_s": None}
+    if t.size == 0:
+        return out
+    out["t_min"], out["t_max"] = int(t[0]), int(t[-1])
+
+    ok = np.flatnonzero(np.isfinite(v))
+    if ok.size:
+        i = ok[-1]
+        out["last_t"], out["last_v"] = int(t[i]), float(v[i])
+        j = ok[min(np.searchsorted(t[ok], t[i] - _DAY), ok.size - 1)]
+        if j != i and t[i] - t[j] <= 2 * _DAY:
+            out["change_24h"] = float(v[i] - v[j])
+
+    lo = np.searchsorted(t, t[-1] - SUMMARY_WINDOW_DAYS * _DAY)
+    w = v[lo:]
+    w = w[np.isfinite(w)]
+    if w.size:
+        stats = np.percentile(w, [0, 10, 50, 90, 100])
+        out.update(zip(("min", "p10", "p50", "p90", "max"), (float(x) for x in stats)))
+
+    recent = t[np.searchsorted(t, t[-1] - SUMMARY_GAP_DAYS * _DAY):]
+    out["gap_s"] = float(np.diff(recent).max() / 1e9) if recent.size > 1 else 0.0
+    return out
+
+def is_current(summary) -> bool:
+    return bool(summary) and summary.get("version") == SUMMARY_VERSION
+
+def station_status(summary, now_ns: int) -> str:
+    """"normal", "high" (latest >= p90), "low" (<= p10), "stale", "no data" or "loading" (summary None)."""
+    if summary is None:
+        return "loading"
+    if summary.get("last_v") is None:
+        return "no data"
+    if now_ns - summary["last_t"] > STATUS_STALE_HOURS * _HOUR:
+        return "stale"
+    if summary["p90"] is not None and summary["last_v"] >= summary["p90"]:
+        return "high"
+    if summary["p10"] is not None and summary["last_v"] <= summary["p10"]:
+        return "low"
+    return "normal"
@@ -0,0 +1,108 @@
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+import tracing
+from singleflight import SingleFlight
+
+
+class StationRecord:
+    """One station version held in memory: metadata plus contiguous arrays.
+
+    t is int64 epoch ns, v is float32; pyramid is the multi-resolution view
+    (see pyramid.build_pyramid) whose "raw" level shares t and v.
+    """
+    __slots__ = ("sid", "href", "cache_key", "meta", "t", "v", "pyramid", "nbytes", "last_used")
+
+    def __init__(self, sid: str, href: str, cache_key: str, meta: dict, pyramid: dict):
+        self.sid = sid
+        self.href = href
+        self.cache_key = cache_key
+        self.meta = meta
+        self.pyramid = pyramid
+        self.t = pyramid["raw"]["t"]
+        self.v = pyramid["raw"]["v"]
+        self.nbytes = sum(a.nbytes for level in pyramid.values() for a in level.values())
+        self.last_used = time.time()
+
+
+def compact_pyramid(pyr: dict, value_dtype: str = "float32") -> dict:
+    """Copy of a pyramid with values narrowed to value_dtype and counts to int32."""
+    out = {}
+    for name, level in pyr.items():
+        out[name] = {}
+        for field, a in level.items():
+            if field == "t":
+                out[name][field] = np.ascontiguousarray(a, dtype="int64")
+            elif field == "count":
+                out[name][field] = np.ascontiguousarray(a, dtype="int32")
+            else:
+                out[name][field] = np.ascontiguousarray(a, dtype=value_dtype)
+    return out
+
+
+def widen_values(a: np.ndarray) -> np.ndarray:
+    """float32 values as the float64 numbers they print as (101.234, not 101.23400115966797).
+
+    Meant for chart-sized arrays: it goes through each value's shortest repr.
+    """
+    if a.dtype != np.float32:
+        return a.astype("float64", copy=False)
+    return a.astype(str).astype("float64")
+
+
+class StationStore:
+    """Process-wide LRU of StationRecords bounded by a total byte budget.
+
+    Records are keyed by href and replaced when the cache key changes. Evicted
+    records are simply dropped: their data stays in the on-disk cache and the
+    loader brings them back on the next view. Concurrent misses for the same
+    version run the loader once.
+    """
+
+    def __init__(self, budget_bytes: int, loader):
+        self.budget_bytes = budget_bytes
+        self._loader = loader  # (path, cache_key) -> StationRecord
+        self._lock = threading.Lock()
+        self._records = OrderedDict()
+        self._total = 0
+        self.loads = SingleFlight("store")
+
+    def get(self, path, cache_key: str) -> StationRecord:
+        href = getattr(path, "href", str(path))
+        with self._lock:
+            rec = self._records.get(href)
+            if rec is not None and rec.cache_key == cache_key:
+                self._records.move_to_end(href)
+                rec.last_used = time.time()
+                return rec
+
+        tracing.cache_miss()
+        return self.loads.do((href, cache_key), self._load, path, href, cache_key)
+
+    def _load(self, path, href: str, cache_key: str) -> StationRecord:
+        rec = self._loader(path, cache_key)
+        with self._lock:
+            old = self._records.pop(href, None)
+            if old is not None:
+                self._total -= old.nbytes
+            self._records[href] = rec
+            self._total += rec.nbytes
+            while self._total > self.budget_bytes and len(self._records) > 1:
+                _, evicted = self._records.popitem(last=False)
+                self._total -= evicted.nbytes
+        return rec
+
+    def report(self) -> dict:
+        """{"budget_bytes", "total_bytes", "stations": [{"station", "rows", "bytes", "last_used"}]}, most recent first."""
+        with self._lock:
+            rows = [{"station": r.sid, "rows": int(r.t.size), "bytes": r.nbytes, "last_used": r.last_used}
+                    for r in reversed(self._records.values())]
+            return {"budget_bytes": self.budget_bytes, "total_bytes": self._total, "stations": rows}
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+            self._total = 0
@@ -0,0 +1,46 @@
+import sys
+from collections import OrderedDict
+from pathlib import Path
+from urllib.parse import urljoin
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+import disk_cache  # noqa: E402
+import parsing  # noqa: E402
+import webdav_client  # noqa: E402
+from config import WEBDAV_BASE, WEBDAV_FOLDER  # noqa: E402
+from mock_webdav import MockWebDAV  # noqa: E402
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    """An empty disk cache (and station store) for the test."""
+    monkeypatch.setattr(disk_cache, "CACHE_DIR", tmp_path / "cache")
+    monkeypatch.setattr(disk_cache, "_manifest", {})
+    monkeypatch.setattr(disk_cache, "_manifest_mtime", None)
+    parsing.station_store.clear()
+    yield tmp_path / "cache"
+    parsing.station_store.clear()
+
+
+@pytest.fixture
+def webdav(monkeypatch, cache_dir):
+    """MockWebDAV over an empty {relative path: bytes} dict, mounted on webdav_client's session.
+
+    mock.remote(rel) is a RemoteTxt for the current state of that file, as a
+    fresh listing would describe it.
+    """
+    monkeypatch.setattr(webdav_client._session, "adapters", OrderedDict(webdav_client._session.adapters))
+    root = urljoin(WEBDAV_BASE, WEBDAV_FOLDER)
+    mock = MockWebDAV({}, root).install(webdav_client._session)
+
+    def remote(rel: str):
+        return webdav_client.RemoteTxt(rel, urljoin(root, rel), mock._etag(rel),
+                                       "Mon, 01 Jan 2024 00:00:00 GMT", len(mock.files[rel]))
+
+    mock.remote = remote
+    return mock
@@ -0,0 +1,63 @@
+import pandas as pd
+
+import parsing
+
+
+def _key(p) -> str:
+    return f"{p.name}|{p.href}|{p.etag}|{p.mtime}|{p.size}"
+
+def _fetch(p):
+    return parsing._fetch_station(p, _key(p))
+
+HEAD = b"# Station: TZ1\n# Latitude: 50.70000\n# Longitude: 7.10000\nDateTime,Height\n"
+
+def _rows(hours) -> bytes:
+    return "".join(f"{pd.Timestamp('2024-01-01') + pd.Timedelta(hours=h):%Y-%m-%dT%H:%M:%S}Z,{100 + h % 7}.125\n"
+                   for h in hours).encode()
+
+ROWS = _rows(range(1000))
+MORE = _rows(range(1000, 1006))
+
+
+def test_append_to_file_with_utc_offsets(webdav):
+    webdav.files["TZ1_levels.txt"] = HEAD + ROWS
+    _, df = _fetch(webdav.remote("TZ1_levels.txt"))
+    assert len(df) == 1000
+
+    webdav.files["TZ1_levels.txt"] += MORE
+    webdav.reset_counters()
+    _, df = _fetch(webdav.remote("TZ1_levels.txt"))
+
+    assert webdav.bytes_sent < len(ROWS) // 2  # only the header and the tail came over
+    assert len(df) == 1006
+    assert df["DateTime"].dt.tz is None
+    assert df["DateTime"].is_monotonic_increasing
+    assert df["DateTime"].iloc[-1] == pd.Timestamp("2024-02-11 21:00:00")
+
+def test_header_edit_forces_full_reload(webdav):
+    webdav.files["TZ1_levels.txt"] = HEAD + ROWS
+    meta, _ = _fetch(webdav.remote("TZ1_levels.txt"))
+    assert meta["latitude"] == "50.70000"
+
+    webdav.files["TZ1_levels.txt"] = HEAD.replace(b"50.70000", b"50.71234") + ROWS + MORE
+    meta, df = _fetch(webdav.remote("TZ1_levels.txt"))
+
+    assert meta["latitude"] == "50.71234"
+    assert len(df) == 1006
+
+def test_ignored_range_is_not_downloaded_twice(webdav, monkeypatch):
+    webdav.files["TZ1_levels.txt"] = HEAD + ROWS
+    _fetch(webdav.remote("TZ1_levels.txt"))
+
+    serve = webdav.send
+    def no_ranges(request, **kwargs):
+        request.headers.pop("Range", None)
+        return serve(request, **kwargs)
+    monkeypatch.setattr(webdav, "send", no_ranges)
+    webdav.files["TZ1_levels.txt"] += MORE
+    webdav.reset_counters()
+    _, df = _fetch(webdav.remote("TZ1_levels.txt"))
+
+    assert len(df) == 1006
+    # The 200 to the Range request is dropped unread; only the full download comes over.
+    assert webdav.bytes_sent == len(webdav.files["TZ1_levels.txt"])
@@ -0,0 +1,94 @@
+import sys
+import time
+from pathlib import Path
+
+import pytest
+import requests
+
+import parsing
+import webdav_client
+from synthetic import synthetic_network, synthetic_station
+
+
+@pytest.fixture
+def station(webdav, monkeypatch):
+    """Stations dict with one header-only entry, and clean background-load state."""
+    monkeypatch.setattr(parsing, "_bg_jobs", {})
+    monkeypatch.setattr(parsing, "_bg_failed", {})
+    webdav.files["S0001_levels.txt"] = synthetic_station(2000, station="S0001")
+    p = webdav.remote("S0001_levels.txt")
+    key = f"{p.name}|{p.href}|{p.etag}|{p.mtime}|{p.size}"
+    return {"S0001": parsing._station_entry(p, key, parsing._head_meta(p), None)}
+
+def _settle(stations, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        out, progress = parsing.fill_coverage(stations)
+        if not progress["pending"] or time.monotonic() > deadline:
+            return out, progress
+        time.sleep(0.01)
+
+def test_finished_loads_are_forgotten_once_on_disk(station):
+    parsing.load_in_background(station)
+    out, progress = _settle(station)
+    assert out["S0001"]["n"] == 2000 and not progress["failed"]
+    deadline = time.monotonic() + 5  # the done-callback runs just after the result is set
+    while parsing._bg_jobs and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert parsing._bg_jobs == {}
+
+    # A session still holding the header-only entry gets coverage from the disk cache.
+    out, progress = parsing.fill_coverage(station)
+    assert out["S0001"]["n"] == 2000 and progress["pending"] == 0
+
+def test_failed_loads_are_retried_after_the_delay(station, webdav, monkeypatch):
+    serve = webdav.send
+    def flaky(request, **kwargs):
+        raise requests.ConnectionError("network blip")
+    monkeypatch.setattr(webdav, "send", flaky)
+    parsing.load_in_background(station)
+    out, progress = _settle(station)
+    assert "S0001" in progress["failed"] and "S0001" not in out
+
+    monkeypatch.setattr(webdav, "send", serve)
+    parsing.load_in_background(station)  # too soon: still reported as failed
+    assert "S0001" in parsing.fill_coverage(station)[1]["failed"]
+
+    monkeypatch.setattr(parsing, "BACKGROUND_RETRY_S", 0)
+    parsing.load_in_background(station)
+    out, progress = _settle(station)
+    assert out["S0001"]["n"] == 2000 and not progress["failed"]
+
+def test_page_retries_when_every_load_failed(webdav, monkeypatch):
+    from streamlit.testing.v1 import AppTest
+
+    monkeypatch.setattr(parsing, "_bg_jobs", {})
+    monkeypatch.setattr(parsing, "_bg_failed", {})
+    monkeypatch.setitem(sys.modules, "__main__", sys.modules["__main__"])  # AppTest replaces it
+    webdav_client.invalidate_listing()
+    webdav.files.update(synthetic_network(2, 500))
+    serve = webdav.send
+    def blip(request, **kwargs):
+        # Header reads (Range) get through; every series download fails.
+        if request.method == "GET" and "Range" not in request.headers:
+            raise requests.ConnectionError("network blip")
+        return serve(request, **kwargs)
+    monkeypatch.setattr(webdav, "send", blip)
+
+    at = AppTest.from_file(str(Path(__file__).resolve().parents[1] / "app.py"), default_timeout=60)
+    at.session_state["view"] = "🗺️ Map"
+    at.run()
+    _settle(parsing.discover_headers(webdav_client.remote_listing()[1]))
+    at.run()
+    assert any("station loads failed" in w.value for w in at.warning)
+    assert not any("No station .txt files" in w.value for w in at.warning)
+
+    monkeypatch.setattr(webdav, "send", serve)
+    monkeypatch.setattr(parsing, "BACKGROUND_RETRY_S", 0)
+    at.run()  # the retry fragment resubmits the loads during this run
+    _settle(parsing.discover_headers(webdav_client.remote_listing()[1]))
+    at.run()
+    assert not any("station loads failed" in w.value for w in at.warning)
+    assert not at.exception
+    assert parsing._bg_failed == {}
+    webdav_client.invalidate_listing()
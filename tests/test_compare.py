@@ -0,0 +1,27 @@
+import numpy as np
+
+import compare
+from pyramid import build_pyramid
+
+DAY = 86_400 * 10**9
+
+
+def _rising(step_ns: int, days: int):
+    """A level rising 1 m/day with a 9-day wave on top, sampled every step_ns."""
+    t = np.arange(0, days * DAY, step_ns, dtype="int64") + np.datetime64("2024-01-01", "ns").view("int64")
+    d = (t - t[0]) / DAY
+    return t, d + np.sin(2 * np.pi * d / 9)
+
+def test_identical_signals_at_different_rates_align():
+    pyramids = {"hourly": build_pyramid(*_rising(DAY // 24, 120)), "daily": build_pyramid(*_rising(DAY, 120))}
+    t0 = int(pyramids["hourly"]["raw"]["t"][0])
+    out = compare.align_stations(pyramids, t0, t0 + 120 * DAY, 200)
+    assert out["levels"]["hourly"] != out["levels"]["daily"]
+
+    diff = compare.difference(out["values"], out["stations"].index("daily"))
+    # Half a bucket off would be 0.5 m; hourly samples 00:00..23:00 average to 11:30, i.e. 0.02 m.
+    assert abs(np.nanmedian(diff[out["stations"].index("hourly")])) < 0.05
+
+    lags, corr = compare.lag_correlation(np.diff(out["values"], axis=1), out["stations"].index("daily"), 10)
+    lag, peak = compare.best_lags(lags, corr)
+    assert lag[out["stations"].index("hourly")] == 0 and peak[out["stations"].index("hourly")] > 0.95
@@ -0,0 +1,65 @@
+import io
+import json
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+import disk_cache
+import export
+import parsing
+
+ROWS = 600
+FILE = (b"# Station: EX1\n# Latitude: 50.7\n# Longitude: 7.1\nDateTime,Height\n"
+        + b"".join(b"2024-01-%02d %02d:00:00,101.234\n" % (1 + h // 24, h % 24) for h in range(ROWS)))
+
+
+@pytest.fixture
+def record(webdav):
+    webdav.files["EX1_levels.txt"] = FILE
+    p = webdav.remote("EX1_levels.txt")
+    return parsing.station_store.get(p, f"{p.name}|{p.href}|{p.etag}|{p.mtime}|{p.size}")
+
+def _read(fmt: str, data: bytes):
+    if fmt == "CSV":
+        return pd.read_csv(io.BytesIO(data), comment="#"), data.decode()
+    table = pq.read_table(io.BytesIO(data)) if fmt == "Parquet" else pa.ipc.open_file(pa.BufferReader(data)).read_all()
+    assert table.schema.field("Value").type == pa.float64()
+    return table.to_pandas(), json.loads(table.schema.metadata[b"rpr:stations"])
+
+@pytest.mark.parametrize("fmt", list(export.FORMATS))
+def test_export_keeps_the_files_values(record, fmt):
+    assert record.v.dtype == "float32"  # the store is narrowed; the export must not be
+    with export.export_file([record], int(record.t[0]), int(record.t[-1]) + 1, fmt) as f:
+        df, meta = _read(fmt, f.read())
+
+    assert len(df) == ROWS
+    assert (df["Value"].to_numpy() == 101.234).all()
+    if fmt == "CSV":
+        assert "# EX1 value_dtype: float64" in meta and ",101.234\n" in meta
+    else:
+        assert meta["EX1"]["value_dtype"] == "float64" and meta["EX1"]["latitude"] == "50.7"
+
+def test_export_without_disk_copy_states_float32(record, chunk_rows=100):
+    with disk_cache._lock:
+        stem = disk_cache._load_manifest()[record.href]["stem"]
+    disk_cache._series_path(stem).unlink()
+    f = io.BytesIO()
+    export.write_export([record], int(record.t[0]), int(record.t[-1]) + 1, "Parquet", f, chunk_rows)
+    df, meta = _read("Parquet", f.getvalue())
+    assert len(df) == ROWS and meta["EX1"]["value_dtype"] == "float32"
+
+@pytest.mark.parametrize("stamps, printed", [
+    (["00:00:00.0", "00:00:01.0", "00:00:02.5"], ["00:00:00.000", "00:00:01.000", "00:00:02.500"]),
+    (["00:00:00.0", "00:00:01.0", "00:00:02.000001"], ["00:00:00.000000", "00:00:01.000000", "00:00:02.000001"]),
+])
+def test_csv_uses_one_exact_time_unit(webdav, stamps, printed):
+    webdav.files["EX2_levels.txt"] = (b"# Station: EX2\nDateTime,Height\n"
+                                      + b"".join(f"2024-01-01 {s},1.5\n".encode() for s in stamps))
+    p = webdav.remote("EX2_levels.txt")
+    rec = parsing.station_store.get(p, f"{p.name}|{p.href}|{p.etag}|{p.mtime}|{p.size}")
+    f = io.BytesIO()
+    export.write_export([rec], int(rec.t[0]), int(rec.t[-1]) + 1, "CSV", f, chunk_rows=2)
+    rows = [line for line in f.getvalue().decode().splitlines() if line.startswith("EX2,")]
+    assert [row.split(",")[1] for row in rows] == [f"2024-01-01 {s}" for s in printed]
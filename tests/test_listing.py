@@ -0,0 +1,45 @@
+import time
+
+import pytest
+import requests
+
+import webdav_client
+
+
+@pytest.fixture
+def listing(webdav):
+    webdav_client.invalidate_listing()
+    yield webdav
+    webdav_client.invalidate_listing()
+
+def _expire():
+    webdav_client._listing["checked"] = time.monotonic() - webdav_client.LISTING_TTL_S - 1
+
+def test_outage_serves_last_listing_without_retrying_until_ttl(listing, monkeypatch):
+    listing.files["A_levels.txt"] = b"# Station: A\nDateTime,Height\n2024-01-01 00:00:00,1.0\n"
+    items, snapshot = webdav_client.remote_listing()
+    assert [it["name"] for it in items] == ["A_levels.txt"]
+
+    calls = []
+    def down(request, **kwargs):
+        calls.append(request.method)
+        raise requests.ConnectionError("server down")
+    monkeypatch.setattr(listing, "send", down)
+
+    _expire()
+    assert webdav_client.remote_listing() == (items, snapshot)
+    assert len(calls) == 1
+    for _ in range(5):
+        assert webdav_client.remote_listing() == (items, snapshot)
+    assert len(calls) == 1  # stale listing served from memory until the next TTL
+
+    _expire()
+    webdav_client.remote_listing()
+    assert len(calls) == 2
+
+def test_outage_without_a_listing_raises(listing, monkeypatch):
+    def down(request, **kwargs):
+        raise requests.ConnectionError("server down")
+    monkeypatch.setattr(listing, "send", down)
+    with pytest.raises(requests.ConnectionError):
+        webdav_client.remote_listing()
@@ -0,0 +1,30 @@
+import multiprocessing
+
+import pandas as pd
+
+import disk_cache
+
+PER_PROCESS = 40
+
+
+def _store_many(cache_dir, prefix):
+    disk_cache.CACHE_DIR = cache_dir
+    df = pd.DataFrame({"DateTime": pd.date_range("2024-01-01", periods=10, freq="h"), "Value": range(10)})
+    for i in range(PER_PROCESS):
+        href = f"/{prefix}{i}.txt"
+        disk_cache.store_series(href, f"{prefix}{i}|{href}|e|m|1", {"Station": f"{prefix}{i}"}, df)
+
+
+def test_concurrent_processes_keep_each_others_entries(cache_dir):
+    ctx = multiprocessing.get_context("spawn")
+    procs = [ctx.Process(target=_store_many, args=(cache_dir, prefix)) for prefix in ("A", "B", "C")]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join(60)
+        assert p.exitcode == 0
+
+    for prefix in ("A", "B", "C"):
+        for i in range(PER_PROCESS):
+            href = f"/{prefix}{i}.txt"
+            assert disk_cache.load_summary(href, f"{prefix}{i}|{href}|e|m|1") is not None
@@ -0,0 +1,19 @@
+import disk_cache
+import parsing
+import ui_map
+from synthetic import synthetic_network
+
+
+def test_markers_map_renders_no_charts(webdav, cache_dir):
+    webdav.files.update(synthetic_network(3, 500))
+    stations = parsing.build_stations([
+        {"name": rel, "href": p.href, "etag": p.etag, "mtime": p.mtime, "size": p.size}
+        for rel, p in ((rel, webdav.remote(rel)) for rel in webdav.files)
+    ])
+
+    ui_map.build_map(stations, "markers").get_root().render()
+
+    assert not (cache_dir / disk_cache._CHARTS_DIR).exists()
+    for sid, s in stations.items():
+        card = ui_map.popup_html_for(sid, s)
+        assert "<svg" not in card and "Chart shown below the map." in card
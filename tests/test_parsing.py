@@ -0,0 +1,27 @@
+import pandas as pd
+import pytest
+
+import parsing
+
+HEAD = "# Station: D1\nDateTime,Height\n"
+
+
+def _parse_both(text: str):
+    data = text.encode()
+    _, by_bytes, _ = parsing.parse_station_bytes(data, "D1_levels.txt")
+    chunks = (data[i:i + 7] for i in range(0, len(data), 7))
+    _, by_stream, _ = parsing.parse_station_stream(chunks, "D1_levels.txt", len(data))
+    return by_bytes["DateTime"].tolist(), by_stream["DateTime"].tolist()
+
+@pytest.mark.parametrize("sep", ["/", "."])
+def test_ambiguous_dates_read_month_first(sep):
+    rows = "".join(f"03{sep}04{sep}2024 {h:02d}:00,1.0\n" for h in range(24))
+    for parsed in _parse_both(HEAD + rows):
+        assert parsed[0] == pd.Timestamp("2024-03-04 00:00")
+
+@pytest.mark.parametrize("sep", ["/", "."])
+def test_a_day_above_12_in_the_sample_reads_day_first(sep):
+    days = ["12", "13", "14"]
+    rows = "".join(f"{d}{sep}04{sep}2024 {h:02d}:00,1.0\n" for d in days for h in range(24))
+    for parsed in _parse_both(HEAD + rows):
+        assert parsed[0] == pd.Timestamp("2024-04-12 00:00") and parsed[-1] == pd.Timestamp("2024-04-14 23:00")
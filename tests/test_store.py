@@ -0,0 +1,11 @@
+import numpy as np
+
+from station_store import widen_values
+
+
+def test_widen_values_keeps_printed_numbers():
+    v = np.array([101.234, 0.001, -3.5, np.nan], dtype="float32")
+    w = widen_values(v)
+    assert w.dtype == np.float64
+    assert w[:3].tolist() == [101.234, 0.001, -3.5] and np.isnan(w[3])
+    assert v.astype("float64")[0] != 101.234  # what plain widening would chart
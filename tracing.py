@@ -0,0 +1,142 @@
+"""Opt-in spans for the load path (RPR_TRACE=1).
+
+    with tracing.span("download", file=name) as sp:
+        ...
+        sp.set(bytes=len(data))
+
+Spans nest per context, are collected into the current run (one Streamlit
+rerun, see begin_run/end_run) and are logged as one JSON line each on the
+"rpr.trace" logger. Cached entry points are wrapped by their caller with
+span(..., cached=True); the cached body calls cache_miss(), so a span whose
+body never ran is reported as a hit. When tracing is off, span() returns a
+shared no-op object and nothing else happens.
+"""
+import contextvars
+import functools
+import json
+import logging
+import sys
+import threading
+import time
+import uuid
+
+from config import TRACE_ENABLED
+
+enabled = TRACE_ENABLED
+
+_log = logging.getLogger("rpr.trace")
+_run_var = contextvars.ContextVar("rpr_trace_run", default=None)
+_stack_var = contextvars.ContextVar("rpr_trace_stack", default=())
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def set(self, **attrs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL = _NullSpan()
+
+
+class Span:
+    __slots__ = ("name", "attrs", "cache", "t0", "ms", "_token")
+
+    def __init__(self, name: str, attrs: dict, cached: bool):
+        self.name = name
+        self.attrs = attrs
+        self.cache = "hit" if cached else None
+        self.t0 = 0.0
+        self.ms = 0.0
+        self._token = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        self._token = _stack_var.set(_stack_var.get() + (self,))
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.ms = (time.perf_counter() - self.t0) * 1000
+        _stack_var.reset(self._token)
+        rec = {"span": self.name, "ms": round(self.ms, 3), **self.attrs}
+        if self.cache:
+            rec["cache"] = self.cache
+        if exc_type is not None:
+            rec["error"] = exc_type.__name__
+        run = _run_var.get()
+        if run is not None:
+            rec["run"] = run["id"]
+            with run["lock"]:
+                run["spans"].append(rec)
+        _log.info(json.dumps(rec, default=str))
+        return False
+
+
+def span(name: str, cached: bool = False, **attrs):
+    """Time a block. cached=True marks a call into a cached function (hit unless cache_miss() runs)."""
+    if not enabled:
+        return _NULL
+    return Span(name, attrs, cached)
+
+def traced(name: str):
+    """Decorator form of span()."""
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return fn(*args, **kwargs)
+            with Span(name, {}, False):
+                return fn(*args, **kwargs)
+        return wrapper
+    return deco
+
+def cache_miss():
+    """Called from a cached function's body: the nearest cached span around it was a miss."""
+    if not enabled:
+        return
+    for sp in reversed(_stack_var.get()):
+        if sp.cache is not None:
+            sp.cache = "miss"
+            return
+
+def submit(pool, fn, *args, **kwargs):
+    """pool.submit that carries the current run and span stack into the worker thread."""
+    if not enabled:
+        return pool.submit(fn, *args, **kwargs)
+    return pool.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+def begin_run(label: str = ""):
+    """Start collecting spans for this script run (no-op when tracing is off)."""
+    if not enabled:
+        return
+    _run_var.set({"id": uuid.uuid4().hex[:8], "label": label, "started": time.time(),
+                  "t0": time.perf_counter(), "lock": threading.Lock(), "spans": []})
+
+def end_run():
+    """Finish the current run and return {"id", "label", "started", "total_ms", "spans"}, or None."""
+    run = _run_var.get()
+    if not enabled or run is None:
+        return None
+    _run_var.set(None)
+    with run["lock"]:
+        spans = list(run["spans"])
+    total_ms = (time.perf_counter() - run["t0"]) * 1000
+    _log.info(json.dumps({"run": run["id"], "label": run["label"], "total_ms": round(total_ms, 3),
+                          "spans": len(spans)}))
+    return {"id": run["id"], "label": run["label"], "started": run["started"],
+            "total_ms": total_ms, "spans": spans}
+
+if enabled and not _log.handlers:
+    _handler = logging.StreamHandler(sys.stderr)
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    _log.addHandler(_handler)
+    _log.setLevel(logging.INFO)
+    _log.propagate = False
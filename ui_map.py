@@ -1,45 +1,76 @@
 
+import time
+
 import folium
+import tracing
 from folium import IFrame
-from config import MAP_INIT_CENTER, MAP_INIT_ZOOM
+from folium.plugins import MarkerCluster
+from config import MAP_INIT_CENTER, MAP_INIT_ZOOM, POPUP_CHART, MAP_MODE, MAP_CLUSTER_MIN
+from station_index import STATUS_COLORS, station_status
+from st_compat import cache_resource
+
+# Popup/tooltip rows shared by the rich HTML card and the compact GeoJSON layer.
+_SUMMARY_FIELDS = [("station", "Station"), ("status", "Status"), ("latest", "Latest"),
+                   ("location", "Location"), ("coordinates", "Coordinates"),
+                   ("provider", "Provider"), ("sensor", "Sensor type"), ("units", "Units"), ("coverage", "Coverage"),
+                   ("recent", "Last year"), ("gap", "Longest gap (30 d)")]
+
+def _fmt_hours(seconds: float) -> str:
+    return f"{seconds / 86400:.1f} d" if seconds >= 2 * 86400 else f"{seconds / 3600:.1f} h"
 
-def popup_html_for(sid: str, s: dict) -> str:
+def _status_fields(s: dict, now_ns: int) -> dict:
+    """Status, latest reading, recent range and longest gap from the station's summary index entry."""
+    summary = s.get("summary")
+    status = station_status(summary, now_ns)
+    out = {"status": status, "latest": "", "recent": "", "gap": "", "color": STATUS_COLORS[status][1]}
+    if summary is None or summary.get("last_v") is None:
+        return out
+    units = s["meta"].get("units") or s["meta"].get("unit") or ""
+    when = time.strftime("%Y-%m-%d %H:%M", time.gmtime(summary["last_t"] / 1e9))
+    change = summary.get("change_24h")
+    trend = f", {change:+.3f} in 24 h" if change is not None else ""
+    out["latest"] = f"{summary['last_v']:.3f} {units} at {when} UTC{trend}".replace("  ", " ")
+    if summary.get("p50") is not None:
+        out["recent"] = (f"median {summary['p50']:.3f}, p10–p90 {summary['p10']:.3f}–{summary['p90']:.3f}, "
+                         f"range {summary['min']:.3f}–{summary['max']:.3f}")
+    if summary.get("gap_s"):
+        out["gap"] = _fmt_hours(summary["gap_s"])
+    return out
+
+def station_summary(sid: str, s: dict, now_ns: int | None = None) -> dict:
+    """Display strings for one station, keyed as in _SUMMARY_FIELDS (plus "color" for its status)."""
     lat = s["lat"]; lon = s["lon"]
     meta = s["meta"]
     location = meta.get("location", "")
     water_body = meta.get("water_body", "")
-    provider = meta.get("provider", "University of Bonn")
-    sensor   = meta.get("sensor_type") or meta.get("sensor") or ""
-    units    = meta.get("units") or meta.get("unit") or ""
     cov_min  = s["t_min"].date() if s["t_min"] is not None else "-"
     cov_max  = s["t_max"].date() if s["t_max"] is not None else "-"
     npts     = s["n"]
-    chart_b64 = s.get("chart_b64", "")
+    return {
+        "station": sid,
+        "location": f"{water_body} ({location})".strip() if water_body else (location or ""),
+        "coordinates": f"{lat:.4f}, {lon:.4f}" if (lat is not None and lon is not None) else "",
+        "provider": meta.get("provider", "University of Bonn"),
+        "sensor": meta.get("sensor_type") or meta.get("sensor") or "",
+        "units": meta.get("units") or meta.get("unit") or "",
+        "coverage": ("loading…" if npts is None else
+                     f"{cov_min} → {cov_max} ({npts} pts)" if (cov_min != "-" and cov_max != "-") else ""),
+        **_status_fields(s, time.time_ns() if now_ns is None else now_ns),
+    }
+
+def popup_html_for(sid: str, s: dict, now_ns: int | None = None) -> str:
+    info = station_summary(sid, s, now_ns)
+    location_line, coords = info["location"], info["coordinates"]
+    provider, sensor, units, coverage = info["provider"], info["sensor"], info["units"], info["coverage"]
 
     def row(label, value):
         if value in ("", None): return ""
         return f"<div style='margin:2px 0;'><span style='font-weight:700'>{label}:</span> <span style='font-weight:400'>{value}</span></div>"
 
-    coords = f"{lat:.4f}, {lon:.4f}" if (lat is not None and lon is not None) else ""
-    location_line = f"{water_body} ({location})".strip() if water_body else (location or "")
-    coverage = f"{cov_min} → {cov_max} ({npts} pts)" if (cov_min != "-" and cov_max != "-") else ""
-
-    chart_block = ""
-    toggle_link = ""
-    if chart_b64:
-        chart_block = f"""
-        <div id="chart-{sid}" style="display:none; margin-top:8px;">
-          <img src="data:image/png;base64,{chart_b64}" style="width:100%; height:auto; border-radius:6px;"/>
-        </div>"""
-        toggle_link = f"""
-        <a href="#" onclick="
-          var el = document.getElementById('chart-{sid}');
-          var card = document.getElementById('card-{sid}');
-          if(el.style.display==='none'){{ el.style.display='block'; card.style.maxWidth='680px'; }}
-          else {{ el.style.display='none'; card.style.maxWidth='440px'; }}
-          return false;" 
-          style="text-decoration:none; font-weight:600;">View chart →</a>
-        """
+    # The chart is rendered only for the clicked station, below the map (see app.py).
+    chart_hint = ""
+    if POPUP_CHART != "none" and s["n"]:
+        chart_hint = "<div style='margin-top:8px; color:#666;'>Chart shown below the map.</div>"
 
     html = f"""
     <div id="wrap-{sid}" style="width:700px;">
@@ -50,33 +81,127 @@ def popup_html_for(sid: str, s: dict) -> str:
         <div id="scroll-{sid}" style="max-height:320px; overflow-y:auto; padding-right:6px;">
           <div style="font-weight:700; margin-bottom:6px;">
              Station: <span style="font-weight:400">{sid}</span>
+             <span style="margin-left:8px; padding:1px 8px; border-radius:8px; color:#fff;
+                   background:{info['color']}; font-weight:600;">{info['status']}</span>
           </div>
+          {row('Latest', info['latest'])}
           {row('Location', location_line)}
           {row('Coordinates', coords)}
           {row('Provider', provider)}
           {row('Sensor type', sensor)}
           {row('Units', units)}
           {row('Coverage', coverage)}
-          {chart_block}
-          <div style="margin-top:8px;">{toggle_link}</div>
+          {row('Last year', info['recent'])}
+          {row('Longest gap (30 d)', info['gap'])}
+          {chart_hint}
         </div>
       </div>
     </div>
     """
     return html
 
-def build_map(stations_dict: dict) -> folium.Map:
-    m = folium.Map(location=MAP_INIT_CENTER, zoom_start=MAP_INIT_ZOOM, control_scale=True)
+def _add_rich_markers(m: folium.Map, stations_dict: dict, now_ns: int):
+    """One Marker per station, coloured by status, with the full HTML card in an IFrame popup."""
     for sid, s in stations_dict.items():
         if s["lat"] is None or s["lon"] is None:
             continue
-        html = popup_html_for(sid, s)
+        html = popup_html_for(sid, s, now_ns)
         iframe = IFrame(html=html, width=700, height=340)
         pop = folium.Popup(iframe, max_width=720, min_width=360, parse_html=True)
+        status = station_status(s.get("summary"), now_ns)
         folium.Marker(
             [s["lat"], s["lon"]],
             popup=pop,
-            tooltip=sid,
-            icon=folium.Icon(color="blue", icon="")
+            tooltip=f"{sid} ({status})",
+            icon=folium.Icon(color=STATUS_COLORS[status][0], icon="")
         ).add_to(m)
-    return m
+
+def station_features(stations_dict: dict, now_ns: int | None = None) -> dict:
+    """GeoJSON FeatureCollection carrying only the compact per-station summary strings."""
+    now_ns = time.time_ns() if now_ns is None else now_ns
+    features = []
+    for sid, s in stations_dict.items():
+        if s["lat"] is None or s["lon"] is None:
+            continue
+        features.append({
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [s["lon"], s["lat"]]},
+            "properties": station_summary(sid, s, now_ns),
+        })
+    return {"type": "FeatureCollection", "features": features}
+
+def _add_geojson_layer(parent, stations_dict: dict, now_ns: int):
+    """A single GeoJSON layer of status-coloured circles; popups are built in the browser on click."""
+    keys = [k for k, _ in _SUMMARY_FIELDS]
+    labels = [label for _, label in _SUMMARY_FIELDS]
+    folium.GeoJson(
+        station_features(stations_dict, now_ns),
+        name="Stations",
+        marker=folium.CircleMarker(radius=8, weight=1.5, color="#333", fill=True, fill_opacity=0.9),
+        style_function=lambda f: {"fillColor": f["properties"]["color"]},
+        tooltip=folium.GeoJsonTooltip(fields=["station", "status"], labels=False),
+        popup=folium.GeoJsonPopup(fields=keys, aliases=labels, max_width=420),
+    ).add_to(parent)
+
+def map_mode_for(n_stations: int) -> str:
+    if MAP_MODE != "auto":
+        return MAP_MODE
+    return "cluster" if n_stations >= MAP_CLUSTER_MIN else "geojson"
+
+def build_map(stations_dict: dict, mode: str | None = None) -> folium.Map:
+    """Folium map of all stations.
+
+    mode: "markers" (rich IFrame cards), "geojson" (one compact GeoJSON
+    layer) or "cluster" (the GeoJSON layer inside a marker cluster).
+    Defaults to map_mode_for(len(stations_dict)). No popup chart is rendered
+    here; app.py draws the clicked station's chart below the map.
+    """
+    mode = mode or map_mode_for(len(stations_dict))
+    now_ns = time.time_ns()
+    with tracing.span("build_map", stations=len(stations_dict), mode=mode):
+        m = folium.Map(location=MAP_INIT_CENTER, zoom_start=MAP_INIT_ZOOM, control_scale=True)
+        if mode == "markers":
+            _add_rich_markers(m, stations_dict, now_ns)
+        elif mode == "cluster":
+            _add_geojson_layer(MarkerCluster(name="Stations").add_to(m), stations_dict, now_ns)
+        else:
+            _add_geojson_layer(m, stations_dict, now_ns)
+        return m
+
+@cache_resource(show_spinner=False, max_entries=4)
+def cached_map(snapshot_hash: str, _stations_dict: dict, mode: str | None = None, loaded: int = 0,
+               status_hour: int = 0) -> folium.Map:
+    """build_map, built once per remote snapshot and shared across reruns and sessions.
+
+    loaded (the number of stations with coverage) keys the progressive
+    versions built while series are still loading in the background;
+    status_hour (hours since the epoch) lets "stale" status age in.
+    """
+    tracing.cache_miss()
+    return build_map(_stations_dict, mode)
+
+def station_at(stations_dict: dict, latlng) -> str | None:
+    """Station id whose marker sits at a clicked {"lat", "lng"}, if any."""
+    if not latlng:
+        return None
+    best, best_d = None, 1e-8
+    for sid, s in stations_dict.items():
+        if s["lat"] is None or s["lon"] is None:
+            continue
+        d = (s["lat"] - latlng["lat"]) ** 2 + (s["lon"] - latlng["lng"]) ** 2
+        if d <= best_d:
+            best, best_d = sid, d
+    return best
+
+def status_legend_html() -> str:
+    """One line of coloured dots naming each map status."""
+    seen, items = set(), []
+    for status, (_, hex_color) in STATUS_COLORS.items():
+        if hex_color in seen:
+            continue
+        seen.add(hex_color)
+        label = "loading / no data" if status == "loading" else status
+        items.append(f"<span style='display:inline-flex; align-items:center; gap:4px; margin-right:12px;'>"
+                     f"<span style='width:10px; height:10px; border-radius:50%; background:{hex_color};"
+                     f" display:inline-block;'></span>{label}</span>")
+    return "<div style='font-size:.85rem; color:#444; margin:.25rem 0;'>" + "".join(items) + "</div>"
@@ -1,11 +1,10 @@
 
-from PIL import Image
 from io import BytesIO
 import base64
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
+import numpy as np
 
 def image_to_base64(path, width: int | None = None) -> str:
+    from PIL import Image  # only needed while building the asset bundle
     img = Image.open(path)
     if width and img.width:
         r = width / img.width
@@ -14,15 +13,22 @@ def image_to_base64(path, width: int | None = None) -> str:
     img.save(buf, format="PNG")
     return base64.b64encode(buf.getvalue()).decode()
 
-def safe_b64(st, path, width: int | None = None) -> str:
+def safe_b64(path, width: int | None, warnings: list) -> str:
+    """image_to_base64, or "" with a message appended to warnings if the image cannot be read."""
     try:
         return image_to_base64(path, width)
     except Exception as e:
-        st.warning(f"Logo missing or unreadable: {path} ({e})")
+        warnings.append(f"Logo missing or unreadable: {path} ({e})")
         return ""
 
 def fig_png_b64(df):
     """Render compact matplotlib line chart (DateTime vs Value) to base64 PNG."""
+    # Imported on first use: matplotlib is only needed for the "png" renderer.
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import matplotlib.dates as mdates
+
     fig, ax = plt.subplots(figsize=(6.0, 2.6), dpi=110)
     ax.plot(df["DateTime"], df["Value"])
     ax.set_xlabel("Date")
@@ -33,5 +39,46 @@ def fig_png_b64(df):
     buf = BytesIO()
     fig.savefig(buf, format="png")
     plt.close(fig)
-    import base64 as _b64
-    return _b64.b64encode(buf.getvalue()).decode()
+    return base64.b64encode(buf.getvalue()).decode()
+
+def sparkline_svg(t, v, width: int = 560, height: int = 200) -> str:
+    """Render a min/max-per-pixel sparkline (int64 epoch ns vs values) as inline SVG.
+
+    No figure machinery: points are scaled with NumPy and each pixel column keeps
+    its low and high value, so peaks survive at any series length.
+    """
+    t = np.asarray(t, dtype="int64")
+    v = np.asarray(v, dtype="float64")
+    ok = np.isfinite(v)
+    t, v = t[ok], v[ok]
+    if t.size == 0:
+        return ""
+
+    pad_l, pad_r, pad_t, pad_b = 46, 8, 8, 20
+    plot_w, plot_h = width - pad_l - pad_r, height - pad_t - pad_b
+    t0, t1 = int(t[0]), int(t[-1])
+    vmin, vmax = float(v.min()), float(v.max())
+    span_t = (t1 - t0) or 1
+    span_v = (vmax - vmin) or 1.0
+
+    col = ((t - t0) * ((plot_w - 1) / span_t)).astype("int64")
+    starts = np.flatnonzero(np.r_[True, col[1:] != col[:-1]])
+    lo = np.minimum.reduceat(v, starts)
+    hi = np.maximum.reduceat(v, starts)
+    xs = np.repeat(pad_l + col[starts], 2)
+    ys = pad_t + (vmax - np.column_stack([lo, hi]).ravel()) * (plot_h / span_v)
+    points = " ".join(f"{x},{y:.1f}" for x, y in zip(xs.tolist(), ys.tolist()))
+
+    d0 = np.datetime64(t0, "ns").astype("datetime64[D]")
+    d1 = np.datetime64(t1, "ns").astype("datetime64[D]")
+    font = "font-family='system-ui, sans-serif' font-size='11' fill='#555'"
+    return (
+        f"<svg xmlns='http://www.w3.org/2000/svg' viewBox='0 0 {width} {height}' width='100%' role='img'>"
+        f"<rect x='{pad_l}' y='{pad_t}' width='{plot_w}' height='{plot_h}' fill='none' stroke='#ddd'/>"
+        f"<polyline points='{points}' fill='none' stroke='#1f77b4' stroke-width='1.2' stroke-linejoin='round'/>"
+        f"<text x='{pad_l - 4}' y='{pad_t + 10}' text-anchor='end' {font}>{vmax:.2f}</text>"
+        f"<text x='{pad_l - 4}' y='{pad_t + plot_h}' text-anchor='end' {font}>{vmin:.2f}</text>"
+        f"<text x='{pad_l}' y='{height - 4}' {font}>{d0}</text>"
+        f"<text x='{width - pad_r}' y='{height - 4}' text-anchor='end' {font}>{d1}</text>"
+        f"</svg>"
+    )
@@ -1,37 +1,129 @@
-
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import MaxRetryError
+from urllib3.util import Retry
 import xml.etree.ElementTree as ET
-from urllib.parse import urljoin
+from urllib.parse import urljoin, urlparse, unquote
 from pathlib import Path
+from collections import deque
+import inspect
 import os
+import threading
+import time
+
+import numpy as np
+
+import tracing
+from singleflight import SingleFlight
+from config import (WEBDAV_BASE, WEBDAV_HOST, WEBDAV_FOLDER, WEBDAV_TOKEN, WEBDAV_PASS, LISTING_TTL_S,
+                    STREAM_CHUNK_BYTES, HTTP_POOL_SIZE, HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT, HTTP_RETRIES,
+                    HTTP_BACKOFF_S, HTTP_BACKOFF_MAX_S, HTTP_BACKOFF_JITTER_S, HTTP_LATENCY_SAMPLES)
+
+
+class NotModified(Exception):
+    """The server answered 304: the file still has the ETag we sent."""
+
+# ---- transport metrics ----
+class TransportStats:
+    """Process-wide request counters and recent latencies (time to response headers), per method."""
+
+    def __init__(self, samples: int):
+        self._lock = threading.Lock()
+        self._samples = samples
+        self._by_method = {}
 
-from config import WEBDAV_BASE, WEBDAV_HOST, WEBDAV_FOLDER, WEBDAV_TOKEN, WEBDAV_PASS
+    def record(self, method: str, status, seconds: float, retries: int):
+        with self._lock:
+            m = self._by_method.get(method)
+            if m is None:
+                m = self._by_method[method] = {"requests": 0, "errors": 0, "retries": 0, "not_modified": 0,
+                                               "latency": deque(maxlen=self._samples)}
+            m["requests"] += 1
+            m["retries"] += retries
+            m["errors"] += status is None or status >= 400
+            m["not_modified"] += status == 304
+            m["latency"].append(seconds)
 
-_session = requests.Session()
+    def stats(self) -> list:
+        """One row per method: counts plus p50/p95/p99/max latency in ms over the recent requests."""
+        with self._lock:
+            rows = [(method, dict(m, latency=np.array(m["latency"]))) for method, m in self._by_method.items()]
+        out = []
+        for method, m in sorted(rows):
+            lat = m.pop("latency") * 1000
+            pct = np.percentile(lat, [50, 95, 99]) if lat.size else [np.nan] * 3
+            out.append({"method": method, **m, "p50 ms": round(float(pct[0]), 1), "p95 ms": round(float(pct[1]), 1),
+                        "p99 ms": round(float(pct[2]), 1), "max ms": round(float(lat.max()), 1) if lat.size else np.nan})
+        return out
+
+    def reset(self):
+        with self._lock:
+            self._by_method.clear()
+
+transport_stats = TransportStats(HTTP_LATENCY_SAMPLES)
+
+# ---- session ----
+class _Session(requests.Session):
+    """requests.Session with default timeouts and per-request metrics."""
+
+    timeout = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+
+    def send(self, request, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+        t0 = time.perf_counter()
+        try:
+            r = super().send(request, **kwargs)
+        except requests.RequestException as e:
+            gave_up = bool(e.args) and isinstance(e.args[0], MaxRetryError)
+            transport_stats.record(request.method, None, time.perf_counter() - t0, HTTP_RETRIES if gave_up else 0)
+            raise
+        history = getattr(getattr(r.raw, "retries", None), "history", None) or ()
+        transport_stats.record(request.method, r.status_code, time.perf_counter() - t0, len(history))
+        return r
+
+_retry = Retry(
+    total=HTTP_RETRIES,
+    allowed_methods=frozenset({"GET", "HEAD", "PROPFIND"}),
+    status_forcelist=(429, 500, 502, 503, 504),
+    backoff_factor=HTTP_BACKOFF_S,
+    backoff_max=HTTP_BACKOFF_MAX_S,
+    backoff_jitter=HTTP_BACKOFF_JITTER_S,
+    raise_on_status=False,  # the last 5xx comes back and raise_for_status reports it
+    # Caps a server's Retry-After; urllib3 < 2.6.3 has no such cap and waits as long as asked.
+    **({"retry_after_max": int(HTTP_BACKOFF_MAX_S)}
+       if "retry_after_max" in inspect.signature(Retry).parameters else {}),
+)
+
+_session = _Session()
 _session.auth = (WEBDAV_TOKEN, WEBDAV_PASS)
+# Compressed transfer where the server offers it; Range requests ask for identity.
+_session.headers["Accept-Encoding"] = "gzip, deflate"
+# Enough pooled connections for every download and background worker to reuse sockets.
+_adapter = HTTPAdapter(pool_connections=1, pool_maxsize=HTTP_POOL_SIZE, max_retries=_retry)
+_session.mount("https://", _adapter)
+_session.mount("http://", _adapter)
+
+def _quote_etag(etag: str) -> str:
+    return etag if etag.startswith(("W/", '"')) else f'"{etag}"'
 
 def _propfind(url: str, depth: str = "1") -> str:
-    r = _session.request("PROPFIND", url, headers={"Depth": depth})
-    r.raise_for_status()
-    return r.text
+    with tracing.span("propfind", depth=depth) as sp:
+        r = _session.request("PROPFIND", url, headers={"Depth": depth})
+        r.raise_for_status()
+        sp.set(bytes=len(r.content))
+        return r.text
 
-def list_remote_txts():
-    """
-    Recursive listing under WEBDAV_FOLDER.
-    Returns: [{"name","href","etag","mtime","size"}]
-    """
-    url = urljoin(WEBDAV_BASE, WEBDAV_FOLDER)
-    xml = _propfind(url, depth="infinity")
+def _parse_multistatus(xml: str):
+    """One dict per <d:response>: href, name, is_dir, etag, mtime, size."""
     ns = {"d": "DAV:"}
     root = ET.fromstring(xml)
-    items = []
+    entries = []
     for resp in root.findall("d:response", ns):
         href_el = resp.find("d:href", ns)
         if href_el is None:
             continue
         href = (href_el.text or "").strip()
-        if not href.lower().endswith(".txt"):
-            continue
 
         propstat = resp.find("d:propstat", ns)
         if propstat is None:
@@ -40,10 +132,8 @@ def list_remote_txts():
         if props is None:
             continue
 
-        name = props.findtext("d:displayname", default=href.split("/")[-1], namespaces=ns)
-        if not name or not name.lower().endswith(".txt"):
-            continue
-
+        is_dir = props.find("d:resourcetype/d:collection", ns) is not None or href.endswith("/")
+        name = props.findtext("d:displayname", default="", namespaces=ns) or href.rstrip("/").split("/")[-1]
         etag = (props.findtext("d:getetag", default="", namespaces=ns) or "").strip('"')
         mtime = props.findtext("d:getlastmodified", default="", namespaces=ns) or ""
         size_text = props.findtext("d:getcontentlength", default="0", namespaces=ns) or "0"
@@ -51,10 +141,87 @@ def list_remote_txts():
             size = int(size_text)
         except Exception:
             size = 0
+        entries.append({"href": href, "name": name, "is_dir": is_dir, "etag": etag, "mtime": mtime, "size": size})
+    return entries
+
+def _same_path(href: str, url: str) -> bool:
+    return unquote(urlparse(urljoin(WEBDAV_HOST, href)).path).rstrip("/") == unquote(urlparse(url).path).rstrip("/")
+
+# ---- cached listing ----
+# Process-wide, so every Streamlit session shares it. Folder state is keyed by
+# collection URL: {"etag", "files": [item, ...], "subdirs": [(url, etag), ...]}.
+_listing_lock = threading.Lock()
+_listing = {"checked": None, "root_etag": None, "folders": {}, "items": None, "hash": ""}
+
+def _walk(url: str, etag: str, old: dict, new: dict):
+    """Collect .txt items under url, re-listing only folders whose ETag changed."""
+    cached = old.get(url)
+    if cached is None or not etag or cached["etag"] != etag:
+        files, subdirs = [], []
+        for e in _parse_multistatus(_propfind(url, depth="1")):
+            if _same_path(e["href"], url):
+                continue
+            child = urljoin(WEBDAV_HOST, e["href"])
+            if e["is_dir"]:
+                subdirs.append((child, e["etag"]))
+            elif e["href"].lower().endswith(".txt") and e["name"].lower().endswith(".txt"):
+                files.append({"name": e["name"], "href": child, "etag": e["etag"], "mtime": e["mtime"], "size": e["size"]})
+        cached = {"etag": etag, "files": files, "subdirs": subdirs}
+    new[url] = cached
+    items = list(cached["files"])
+    for sub_url, sub_etag in cached["subdirs"]:
+        items.extend(_walk(sub_url, sub_etag, old, new))
+    return items
+
+# One refresh at a time process-wide; sessions that ask meanwhile share its outcome.
+listing_flight = SingleFlight("listing")
+
+def _refresh_listing():
+    url = urljoin(WEBDAV_BASE, WEBDAV_FOLDER)
+    root = [e for e in _parse_multistatus(_propfind(url, depth="0")) if _same_path(e["href"], url)]
+    root_etag = root[0]["etag"] if root else ""
+    with _listing_lock:
+        unchanged = root_etag and root_etag == _listing["root_etag"] and _listing["items"] is not None
+        old_folders = _listing["folders"]
+    if not unchanged:
+        folders = {}
+        items = sorted(_walk(url, root_etag, old_folders, folders), key=lambda x: (x["name"].lower(), x["href"]))
+    with _listing_lock:
+        if not unchanged:
+            _listing.update(root_etag=root_etag, folders=folders, items=items, hash=remote_snapshot_hash(items))
+        _listing["checked"] = time.monotonic()
 
-        file_url = urljoin(WEBDAV_HOST, href)
-        items.append({"name": name, "href": file_url, "etag": etag, "mtime": mtime, "size": size})
-    return sorted(items, key=lambda x: (x["name"].lower(), x["href"]))
+def remote_listing():
+    """Cached recursive listing under WEBDAV_FOLDER, refreshed at most every LISTING_TTL_S.
+
+    Returns (items, snapshot_hash), items as from list_remote_txts().
+    """
+    with _listing_lock:
+        checked = _listing["checked"]
+    if checked is None or time.monotonic() - checked >= LISTING_TTL_S:
+        try:
+            listing_flight.do("listing", _refresh_listing)
+        except Exception:
+            # Keep serving the last good listing while the server is unreachable,
+            # and do not ask again before the next TTL.
+            with _listing_lock:
+                if _listing["items"] is None:
+                    raise
+                _listing["checked"] = time.monotonic()
+    with _listing_lock:
+        return list(_listing["items"] or []), _listing["hash"]
+
+def invalidate_listing():
+    """Forget the cached listing so the next call re-walks the server from scratch."""
+    with _listing_lock:
+        _listing.update(checked=None, root_etag=None, folders={}, items=None, hash="")
+
+def list_remote_txts():
+    """
+    Recursive listing under WEBDAV_FOLDER (cached, see remote_listing).
+    Returns: [{"name","href","etag","mtime","size"}]
+    """
+    return remote_listing()[0]
 
 def remote_snapshot_hash(items) -> str:
     """Hash of folder state to drive cache invalidation."""
@@ -63,7 +230,7 @@ def remote_snapshot_hash(items) -> str:
     return hashlib.sha256(s.encode()).hexdigest()
 
 class RemoteTxt(os.PathLike):
-    """Path-like wrapper for a remote text file so code can call .read_text(), .stem."""
+    """Path-like wrapper for a remote text file: name/stem plus streaming, ranged and conditional reads."""
     def __init__(self, name: str, href: str, etag: str = "", mtime: str = "", size: int = 0):
         self.name = name
         self.href = href
@@ -71,11 +238,71 @@ class RemoteTxt(os.PathLike):
         self.mtime = mtime
         self.size = size
 
-    def read_text(self, encoding="utf-8", errors="ignore") -> str:
-        r = _session.get(self.href)
-        r.raise_for_status()
-        r.encoding = r.encoding or "utf-8"
-        return r.text
+    def read_bytes(self, etag: str = "") -> bytes:
+        """The whole file. With etag, raises NotModified if the file still has it."""
+        with tracing.span("download", file=self.name) as sp:
+            r = _session.get(self.href, headers={"If-None-Match": _quote_etag(etag)} if etag else None)
+            sp.set(status=r.status_code)
+            if r.status_code == 304:
+                raise NotModified(self.href)
+            r.raise_for_status()
+            sp.set(bytes=len(r.content))
+            return r.content
+
+    def read_head(self, nbytes: int) -> bytes:
+        """First nbytes of the file (fewer if it is shorter), via a Range request."""
+        with tracing.span("download_head", file=self.name) as sp:
+            headers = {"Range": f"bytes=0-{nbytes - 1}", "Accept-Encoding": "identity"}
+            with _session.get(self.href, headers=headers, stream=True) as r:
+                sp.set(status=r.status_code)
+                if r.status_code == 416:  # empty file
+                    return b""
+                r.raise_for_status()
+                # A server that ignores Range sends the whole file; stop reading early.
+                data = b""
+                for chunk in r.iter_content(nbytes):
+                    data += chunk
+                    if len(data) >= nbytes:
+                        break
+            sp.set(bytes=min(len(data), nbytes))
+            return data[:nbytes]
+
+    def iter_bytes(self, chunk_size: int = STREAM_CHUNK_BYTES, etag: str = ""):
+        """Iterator over the body in chunks as it arrives; the full response is never held in memory.
+
+        The request is made here, not on first iteration: with etag, raises
+        NotModified straight away if the file still has it.
+        """
+        r = _session.get(self.href, headers={"If-None-Match": _quote_etag(etag)} if etag else None, stream=True)
+        if r.status_code == 304:
+            r.close()
+            raise NotModified(self.href)
+        try:
+            r.raise_for_status()
+        except requests.HTTPError:
+            r.close()
+            raise
+
+        def body():
+            with r:
+                yield from r.iter_content(chunk_size)
+        return body()
+
+    def read_range(self, start: int):
+        """Bytes from offset `start` to EOF, or None if the server did not honour the Range."""
+        # Ranges address the stored bytes, so ask for them unencoded.
+        with tracing.span("download_range", file=self.name, start=start) as sp:
+            headers = {"Range": f"bytes={start}-", "Accept-Encoding": "identity"}
+            with _session.get(self.href, headers=headers, stream=True) as r:
+                sp.set(status=r.status_code)
+                if r.status_code == 416:
+                    return None
+                r.raise_for_status()
+                if r.status_code != 206:
+                    return None  # the whole file is on its way; closing drops it unread
+                data = r.content
+            sp.set(bytes=len(data))
+            return data
 
     def __fspath__(self):
         return self.name